@@ -1,14 +1,23 @@
-from flask import Flask, render_template, jsonify, request,send_from_directory
+from flask import Flask, render_template, jsonify, request,send_from_directory, Response
 from collectors.myo_collector import MyoManager
 from collectors.realsense_collector import RealSenseCollector
+from collectors.data_recorder import DataRecorder
+from collectors.telemetry_broker import TelemetryBroker
+from collectors.video_stream import AdaptiveVideoStream
+from collectors.telemetry_stream import TelemetrySession, TELEMETRY_ENCODERS
+from data_processing.decimation import StreamingDecimator
+from data_processing.emg_filter import normalize_filter_pipeline, DEFAULT_FILTER_PIPELINE
+from data_processing.onset_detection import active_range
+from data_storage.trial_writer import TrialWriter
+from data_storage.schema import DEFAULT_COMPRESSION, COMPRESSION_OPTIONS
+from data_storage.save_queue import TrialSaveQueue, fsync_file
+from data_storage.trial_journal import TrialJournal, JOURNAL_SUFFIX, recover_journals
+from data_storage.video_recorder import VideoRecorder, video_stream_fields
+from data_storage.catalog import TrialCatalog
 from threading import Thread, Lock
 import time
-import base64
-import cv2
 import json
 import os
-import h5py
-import numpy as np
 from datetime import datetime
 
 app = Flask(__name__)
@@ -19,9 +28,23 @@ VIDEO_FOLDER = os.path.join(app.static_folder, 'videos')
 os.makedirs(VIDEO_FOLDER, exist_ok=True)
 
 
+# 实时视频流multipart分隔符
+VIDEO_FEED_BOUNDARY = 'frame'
+# /get_data增量长轮询的最长等待时间（秒）
+LONG_POLL_TIMEOUT = 1.0
+# 自动开始/自动裁剪时在激活区间前后保留的时长（秒）
+ACTIVATION_PRE_MARGIN = 0.5
+ACTIVATION_POST_MARGIN = 0.5
+
+
 # 全局变量
 myo_manager = None
 realsense_collector = None
+trial_catalog = None
+telemetry_broker = None
+data_recorder = DataRecorder()
+save_queue = TrialSaveQueue()
+video_recorder = VideoRecorder()
 experiment_lock = Lock()
 experiment_config = None
 experiment_state = {
@@ -29,7 +52,6 @@ experiment_state = {
     'current_action': None,
     'current_trial': 0,
     'recording_start_time': None,
-    'recorded_data': [],
     'subject_id': None
 }
 
@@ -48,6 +70,26 @@ def save_experiment_config():
                 'message': '实验配置无效'
             })
         
+        # 滤波管线（未指定时使用默认管线），记录中不允许切换；
+        # 采样率由Myo固定，不接受客户端设置
+        try:
+            client_pipeline = dict(config.get('filterPipeline') or {})
+            client_pipeline['sampling_rate'] = DEFAULT_FILTER_PIPELINE['sampling_rate']
+            filter_pipeline = normalize_filter_pipeline(client_pipeline)
+        except (ValueError, TypeError, KeyError) as e:
+            return jsonify({
+                'status': 'error',
+                'message': f'滤波管线无效: {e}'
+            })
+        if experiment_state['is_recording']:
+            return jsonify({
+                'status': 'error',
+                'message': '记录中不能修改实验配置'
+            })
+        if myo_manager:
+            myo_manager.set_filter_pipeline(filter_pipeline)
+        config['filterPipeline'] = filter_pipeline
+        
         # 创建数据存储目录
         data_path = os.path.join('data', 'raw', config['subjectId'])
         os.makedirs(data_path, exist_ok=True)
@@ -85,6 +127,8 @@ def validate_experiment_config(config):
         return False
     if not config['selectedActions']:
         return False
+    if config.get('compression', DEFAULT_COMPRESSION) not in COMPRESSION_OPTIONS:
+        return False
         
     return True
 
@@ -104,7 +148,6 @@ def start_experiment():
             'current_action': None,
             'current_trial': 0,
             'recording_start_time': None,
-            'recorded_data': [],
             'subject_id': experiment_config['subjectId']
         }
         
@@ -127,19 +170,41 @@ def record_action():
         
         # 初始化记录状态
         with experiment_lock:
+            # 已在记录时拒绝（如另一个页面或重复点击），避免当前试验文件被覆盖而未关闭
+            if experiment_state['is_recording']:
+                return jsonify({
+                    'status': 'error',
+                    'message': '正在记录中，请先停止当前记录'
+                }), 409
+            
             experiment_state = {
                 'is_recording': True,
                 'current_action': data.get('action', 'manual_recording'),
                 'current_trial': data.get('trial', int(time.time())),
                 'recording_start_time': time.time(),
-                'recorded_data': [],
                 'subject_id': data.get('subject_id'),
-                'dominant_hand': data.get('dominant_hand')
+                'dominant_hand': data.get('dominant_hand'),
+                'record_video': bool(data.get('record_video',
+                                              (experiment_config or {}).get('recordVideo', False))),
+                # 检测到肌肉激活后才开始写入；停止时标记激活数据的时间范围
+                'auto_start': bool(data.get('auto_start', (experiment_config or {}).get('autoStart', False))),
+                'auto_trim': bool(data.get('auto_trim', (experiment_config or {}).get('autoTrim', False)))
             }
-        
-        # 创建数据存储目录
-        data_path = os.path.join('data', 'raw', experiment_state['subject_id'])
-        os.makedirs(data_path, exist_ok=True)
+            
+            # 创建数据存储目录
+            data_path = os.path.join('data', 'raw', experiment_state['subject_id'])
+            os.makedirs(data_path, exist_ok=True)
+            
+            # 由记录器直接按原生速率采集数据，并在记录过程中流式写入文件和预写日志
+            writer, journal = create_trial_writer(data_path)
+            if experiment_state['auto_start']:
+                data_recorder.arm(writer, journal, pre_trigger=ACTIVATION_PRE_MARGIN)
+            else:
+                data_recorder.start(writer, journal)
+            
+            # 可选：同步录制相机彩色视频
+            if experiment_state['record_video']:
+                video_recorder.start(os.path.splitext(writer.filepath)[0] + '.mp4')
         
         return jsonify({
             'status': 'success',
@@ -156,15 +221,28 @@ def record_action():
 def stop_recording():
     global experiment_state
     try:
+        job_id = None
         with experiment_lock:
             if experiment_state['is_recording']:
-                # 保存当前trial的数据
-                save_trial_data()
+                # 先送出尚未滤波的最后一批EMG样本
+                if myo_manager:
+                    myo_manager.flush()
+                writer, journal = data_recorder.stop()
+                video_session = video_recorder.stop()
+                end_time = time.time()
                 experiment_state['is_recording'] = False
+                if writer is not None and experiment_state.get('auto_trim'):
+                    mark_active_range(writer, end_time, journal)
+                # 交给后台写入线程保存当前trial的数据
+                if writer is not None:
+                    job_id = save_queue.submit(
+                        lambda: save_trial_data(writer, end_time, journal, video_session),
+                        filepath=writer.filepath)
         
         return jsonify({
             'status': 'success',
-            'message': '记录已停止'
+            'message': '记录已停止',
+            'job_id': job_id
         })
         
     except Exception as e:
@@ -173,84 +251,78 @@ def stop_recording():
             'message': str(e)
         })
 
-def save_trial_data():
-    """保存单次试验数据为HDF5格式"""
-    global experiment_state
+def create_trial_writer(data_path):
+    """为当前trial创建流式HDF5写入器及其预写日志"""
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    filename = f"{experiment_state['subject_id']}_{experiment_state['current_action']}_{timestamp}.h5"
+    filepath = os.path.join(data_path, filename)
     
-    if not experiment_state['recorded_data']:
+    metadata = {
+        'subject_id': experiment_state['subject_id'],
+        'dominant_hand': experiment_state['dominant_hand'],
+        'action': experiment_state['current_action'],
+        'trial_timestamp': experiment_state['current_trial'],
+        'recording_start_time': experiment_state['recording_start_time'],
+        'auto_start': experiment_state.get('auto_start', False),
+        'auto_trim': experiment_state.get('auto_trim', False),
+        # 实际使用的滤波管线，离线处理可据此复现在线滤波
+        'filter_pipeline': json.dumps(current_filter_pipeline(), sort_keys=True)
+    }
+    streams = dict(data_recorder.streams)
+    if experiment_state.get('record_video'):
+        streams['video'] = video_stream_fields()
+    
+    compression = (experiment_config or {}).get('compression', DEFAULT_COMPRESSION)
+    writer = TrialWriter(filepath, metadata, streams,
+                         dataset_attrs=data_recorder.dataset_attrs(),
+                         static_datasets=data_recorder.static_datasets(),
+                         compression=compression)
+    journal = TrialJournal(filepath + JOURNAL_SUFFIX, filepath, metadata,
+                           streams, data_recorder.dataset_attrs(),
+                           data_recorder.static_datasets(), compression=compression)
+    return writer, journal
+
+def mark_active_range(writer, end_time, journal=None):
+    """自动裁剪：把包含所有激活区间的时间范围写入元数据，离线处理只读取该范围"""
+    intervals = data_recorder.activation_intervals(end_time)
+    active = active_range(intervals, ACTIVATION_PRE_MARGIN, ACTIVATION_POST_MARGIN)
+    if active is not None:
+        attrs = {'active_start_time': active[0], 'active_end_time': active[1]}
+        writer.set_attrs('metadata', attrs)
+        if journal is not None:
+            journal.set_attrs('metadata', attrs)
+
+def current_filter_pipeline():
+    """在线滤波正在使用的滤波管线"""
+    pipeline = myo_manager.get_filter_pipeline() if myo_manager else None
+    return pipeline or normalize_filter_pipeline((experiment_config or {}).get('filterPipeline'))
+
+def save_trial_data(writer, end_time=None, journal=None, video_session=None):
+    """保存单次试验数据：数据已在记录过程中写入，这里只需刷新并关闭文件"""
+    if writer is None:
         return
     
     try:
-        # 构建文件名
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{experiment_state['subject_id']}_{experiment_state['current_action']}_{timestamp}.h5"
-        filepath = os.path.join('data', 'raw', experiment_state['subject_id'], filename)
-        
-        # 保存数据到HDF5文件
-        with h5py.File(filepath, 'w') as f:
-            # 创建元数据组
-            metadata = f.create_group('metadata')
-            metadata.attrs['subject_id'] = experiment_state['subject_id']
-            metadata.attrs['dominant_hand'] = experiment_state['dominant_hand']
-            metadata.attrs['action'] = experiment_state['current_action']
-            metadata.attrs['trial_timestamp'] = experiment_state['current_trial']
-            metadata.attrs['recording_start_time'] = experiment_state['recording_start_time']
-            metadata.attrs['recording_end_time'] = time.time()
-            
-            # 创建数据组
-            data = f.create_group('data')
-            
-            # 提取数据
-            timestamps = []
-            emg_raw_data = []
-            emg_filtered_data = []
-            hand_data_list = []
-            
-            # 添加调试输出
-            print("开始处理记录数据...")
-            print(f"记录数据点数: {len(experiment_state['recorded_data'])}")
-            
-            for frame in experiment_state['recorded_data']:
-                timestamps.append(frame['timestamp'])
-                emg_raw_data.append(frame['emg_data']['raw_emg'])
-                emg_filtered_data.append(frame['emg_data']['filtered_emg'])
-                
-                # 处理手部数据，确保数据格式正确
-                hand_data = frame.get('hand_data', {})
-                if hand_data:
-                    print("手部数据示例:", hand_data)  # 调试输出
-                hand_data_list.append(hand_data)
-            
-            # 保存时间戳
-            data.create_dataset('timestamps', data=np.array(timestamps))
-            
-            # 保存EMG数据
-            data.create_dataset('emg_raw', data=np.array(emg_raw_data))
-            data.create_dataset('emg_filtered', data=np.array(emg_filtered_data))
-            
-            # 保存手部数据
-            # 首先获取所有可能的关节角度键
-            all_keys = set()
-            for hand_data in hand_data_list:
-                all_keys.update(hand_data.keys())
-            
-            # 创建结构化的手部数据数组
-            hand_angles = np.zeros((len(hand_data_list), len(all_keys)))
-            key_list = sorted(list(all_keys))  # 确保键的顺序一致
-            
-            # 填充数据
-            for i, hand_data in enumerate(hand_data_list):
-                for j, key in enumerate(key_list):
-                    hand_angles[i, j] = hand_data.get(key, 0)
-            
-            # 保存手部数据和关节名称
-            hand_angles_dataset = data.create_dataset('hand_angles', data=hand_angles)
-            hand_angles_dataset.attrs['joint_names'] = [str(k) for k in key_list]
-            
-            print(f"数据保存完成: {filepath}")
-            print(f"保存的关节数量: {len(key_list)}")
-            print("关节名称:", key_list)
-            
+        video_table = None
+        if video_session is not None:
+            video_table = video_session.finish()
+            save_video_table(writer, video_table, journal)
+        if journal is not None:
+            journal.close()
+        writer.close(end_time=end_time or time.time())
+        # 试验文件（含视频时间戳表）和视频落盘后，日志才不再需要
+        fsync_file(writer.filepath)
+        if video_table is not None:
+            fsync_file(video_table['filepath'])
+        if journal is not None:
+            journal.discard()
+        
+        # 更新试验索引（索引失败不影响已保存的数据）
+        if trial_catalog is not None:
+            try:
+                trial_catalog.index_file(writer.filepath)
+            except Exception as e:
+                print(f"更新试验索引错误: {e}")
         return True
         
     except Exception as e:
@@ -259,6 +331,80 @@ def save_trial_data():
         print(traceback.format_exc())
         raise
 
+def save_video_table(writer, video_table, journal=None):
+    """把视频帧时间戳表写入试验文件的video/组（同时写入预写日志）"""
+    attrs = {
+        'video_file': os.path.basename(video_table['filepath']),
+        'fps': video_recorder.fps,
+        'codec': video_recorder.fourcc,
+        'encoded_frames': len(video_table['timestamps']),
+        'dropped_frames': video_table['dropped_frames']
+    }
+    writer.append('video', video_table['timestamps'], video_table['camera_frame_index'])
+    writer.write_dataset('video/dropped_timestamps', video_table['dropped_timestamps'])
+    writer.set_attrs('video', attrs)
+    if journal is not None:
+        for row in zip(video_table['timestamps'], video_table['camera_frame_index']):
+            journal.append('video', *row)
+        journal.write_dataset('video/dropped_timestamps', video_table['dropped_timestamps'])
+        journal.set_attrs('video', attrs)
+    if video_table['dropped_frames']:
+        print(f"视频编码丢帧: {video_table['dropped_frames']}")
+
+@app.route('/save_status')
+@app.route('/save_status/<job_id>')
+def save_status(job_id=None):
+    """查询后台保存任务状态"""
+    status = save_queue.get_status(job_id)
+    if job_id is not None and status is None:
+        return jsonify({
+            'status': 'error',
+            'message': '保存任务不存在'
+        }), 404
+    
+    return jsonify({
+        'status': 'success',
+        'jobs': status if job_id is None else {job_id: status},
+        'pending': save_queue.pending_count()
+    })
+
+@app.route('/trials')
+def list_trials():
+    """从试验索引中列出/筛选试验"""
+    if trial_catalog is None:
+        return jsonify({
+            'status': 'error',
+            'message': '试验索引未初始化'
+        })
+    
+    try:
+        args = request.args
+        trials = trial_catalog.query(
+            subject_id=args.get('subject_id'),
+            action=args.get('action'),
+            dominant_hand=args.get('dominant_hand'),
+            min_duration=args.get('min_duration', type=float),
+            max_duration=args.get('max_duration', type=float),
+            since=args.get('since', type=float),
+            until=args.get('until', type=float),
+            limit=args.get('limit', type=int))
+        
+        if args.get('stats'):
+            for trial in trials:
+                trial['channel_stats'] = trial_catalog.get_channel_stats(trial['path'])
+        
+        return jsonify({
+            'status': 'success',
+            'count': len(trials),
+            'trials': trials
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'status': 'error',
+            'message': str(e)
+        })
+
 @app.route('/get_experiment_status')
 def get_experiment_status():
     """获取实验状态"""
@@ -312,53 +458,110 @@ def index():
     return render_template('index.html')
 
 
+@app.route('/video_feed')
+def video_feed():
+    """相机画面的MJPEG视频流，与/get_data的遥测数据相互独立
+
+    可选参数 quality(JPEG质量)、scale(缩放比例)、fps(最高帧率)；
+    客户端连接拥塞时服务端会自动降低规格，恢复后再逐级回到请求的设置。
+    """
+    global realsense_collector
+    if not realsense_collector or not realsense_collector.is_running:
+        return jsonify({
+            'status': 'error',
+            'message': 'RealSense相机未启动'
+        }), 503
+    stream = AdaptiveVideoStream(quality=request.args.get('quality', 80, type=int),
+                                 scale=request.args.get('scale', 1.0, type=float),
+                                 max_fps=request.args.get('fps', 30.0, type=float),
+                                 boundary=VIDEO_FEED_BOUNDARY)
+    return Response(stream.frames(realsense_collector),
+                    mimetype=f'multipart/x-mixed-replace; boundary={VIDEO_FEED_BOUNDARY}')
+
+
+@app.route('/telemetry')
+def telemetry():
+    """推送遥测流：批量EMG样本、逐帧关节角度和每秒一次的设备状态
+
+    默认为SSE+JSON，?format=binary时使用紧凑二进制编码。
+    ?decimate=minmax|lttb&pixels=<显示宽度>&window=<秒>时按客户端显示参数抽取EMG，
+    浏览器绘制的点数与窗口长度无关。
+    """
+    if not telemetry_broker:
+        return jsonify({
+            'status': 'error',
+            'message': '遥测发布者未启动'
+        }), 503
+    wire_format = request.args.get('format', 'json')
+    if wire_format not in TELEMETRY_ENCODERS:
+        return jsonify({
+            'status': 'error',
+            'message': f'不支持的遥测格式: {wire_format}'
+        }), 400
+    decimator = None
+    if request.args.get('decimate'):
+        try:
+            decimator = StreamingDecimator(pixels=request.args.get('pixels', 800, type=int),
+                                           window=request.args.get('window', 10.0, type=float),
+                                           mode=request.args.get('decimate'),
+                                           sampling_rate=current_filter_pipeline()['sampling_rate'])
+        except ValueError as e:
+            return jsonify({
+                'status': 'error',
+                'message': str(e)
+            }), 400
+    encoder = TELEMETRY_ENCODERS[wire_format]()
+    session = TelemetrySession(telemetry_broker, encoder, decimator=decimator)
+    return Response(session.events(), mimetype=encoder.mimetype,
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+def get_camera_status():
+    """相机运行状态和统计信息"""
+    camera_stats = {'camera_fps': 0, 'camera_total_frames': 0}
+    if realsense_collector:
+        try:
+            camera_stats = realsense_collector.get_camera_stats()
+        except Exception as e:
+            print(f"获取相机统计信息错误: {e}")
+    camera_stats['camera_active'] = bool(realsense_collector and realsense_collector.is_running)
+    return camera_stats
+
+
 @app.route('/get_data')
 def get_data():
-    global myo_manager, realsense_collector, experiment_state
+    """实时数据轮询接口
+
+    不带参数时返回最新快照；带?since=<seq>时为增量长轮询：只返回该序号之后的
+    EMG样本、手部帧和状态，未变化的字段省略，没有新数据时最多等待LONG_POLL_TIMEOUT秒。
+    """
+    global telemetry_broker
     try:
-        # 获取EMG数据
-        emg_data = myo_manager.get_latest_data() if myo_manager else {'raw_emg': [0] * 8, 'filtered_emg': [0] * 8}
-        
-        # 获取手部数据和相机帧
-        hand_data = realsense_collector.get_hand_data() if realsense_collector else {}
-        frame = realsense_collector.get_frame()
+        if not telemetry_broker:
+            raise RuntimeError('遥测发布者未启动')
+        since = request.args.get('since', type=int)
+        if since is not None:
+            result = telemetry_broker.get_since(since, timeout=LONG_POLL_TIMEOUT)
+            if result is not None:
+                return jsonify(build_incremental_update(*result))
         
-        # 获取相机统计信息
-        camera_stats = {}
-        if realsense_collector:
-            try:
-                camera_stats = realsense_collector.get_camera_stats()
-            except Exception as e:
-                print(f"获取相机统计信息错误: {e}")
-                camera_stats = {'camera_fps': 0, 'camera_total_frames': 0}
-        else:
-            camera_stats = {'camera_fps': 0, 'camera_total_frames': 0}
-
-        # 转换相机帧为base64
-        frame_base64 = ''
-        if frame is not None:
-            _, buffer = cv2.imencode('.jpg', frame)
-            frame_base64 = base64.b64encode(buffer).decode('utf-8')
+        # 读取发布者的最新快照，不直接访问采集器（相机画面通过/video_feed单独推送）
+        latest = telemetry_broker.get_latest()
+        camera_stats = latest['status']
         
         # 准备响应数据
         response_data = {
             'status': 'success',
-            'emg_data': emg_data,
-            'hand_data': hand_data,
-            'frame': frame_base64,
+            'seq': latest['seq'],
+            'reset': since is not None,
+            'emg_data': latest['emg_data'],
+            'hand_data': latest['hand_data'],
+            'camera_active': camera_stats.get('camera_active', False),
             'timestamp': time.time(),
             'camera_fps': camera_stats.get('camera_fps', 0),
             'camera_total_frames': camera_stats.get('camera_total_frames', 0)
         }
         
-        # 如果正在记录，保存数据
-        if experiment_state['is_recording']:
-            experiment_state['recorded_data'].append({
-                'timestamp': response_data['timestamp'],
-                'emg_data': emg_data,
-                'hand_data': hand_data
-            })
-        
         return jsonify(response_data)
     
     except Exception as e:
@@ -370,11 +573,65 @@ def get_data():
             'message': str(e),
             'emg_data': {'raw_emg': [0] * 8, 'filtered_emg': [0] * 8},
             'hand_data': {},
-            'frame': '',
+            'camera_active': False,
             'camera_fps': 0,
             'camera_total_frames': 0
         })
 
+
+def build_incremental_update(seq, messages):
+    """把发布者的消息合并为增量响应，只包含有变化的字段"""
+    update = {'status': 'success', 'seq': seq, 'timestamp': time.time()}
+    emg_samples = [sample for message in messages if message.kind == 'emg' for sample in message.data]
+    if emg_samples:
+        update['emg'] = {
+            'timestamps': [sample[0] for sample in emg_samples],
+            'raw_emg': [list(sample[1]) for sample in emg_samples],
+            'filtered_emg': [list(sample[2]) for sample in emg_samples]
+        }
+    hand_frames = [message.data for message in messages if message.kind == 'hand']
+    if hand_frames:
+        update['hand'] = [dict(frame, hand_data=frame['hand_data'] or {}) for frame in hand_frames]
+    feature_frames = [frame for message in messages if message.kind == 'features' for frame in message.data]
+    if feature_frames:
+        update['features'] = {
+            'timestamps': [frame[0] for frame in feature_frames],
+            'values': [frame[1].tolist() for frame in feature_frames]
+        }
+    segment_markers = [marker for message in messages if message.kind == 'segments' for marker in message.data]
+    if segment_markers:
+        update['segments'] = [{'kind': kind, 'timestamp': timestamp} for kind, timestamp in segment_markers]
+    statuses = [message.data for message in messages if message.kind == 'status']
+    if statuses:
+        update.update(statuses[-1])
+    return update
+
+@app.route('/calibrate_activation', methods=['POST'])
+def calibrate_activation():
+    """受试者放松时重新估计激活检测的静息基线"""
+    if not myo_manager:
+        return jsonify({
+            'status': 'error',
+            'message': 'Myo未初始化'
+        })
+    myo_manager.recalibrate_activation()
+    return jsonify({
+        'status': 'success',
+        'message': '正在重新估计静息基线'
+    })
+
+@app.route('/activation_status')
+def activation_status():
+    """激活检测状态和自动开始的触发状态"""
+    recorder_status = data_recorder.get_status()
+    return jsonify({
+        'status': 'success',
+        'detector': myo_manager.get_activation_status() if myo_manager else None,
+        'armed': recorder_status['armed'],
+        'trigger_time': recorder_status['trigger_time'],
+        'segment_markers': recorder_status['segment_markers']
+    })
+
 @app.route('/myo_status')
 def myo_status():
     global myo_manager
@@ -397,6 +654,15 @@ if __name__ == '__main__':
         # 创建数据存储目录
         os.makedirs(os.path.join('data', 'raw'), exist_ok=True)
         
+        # 恢复上次异常退出时未保存的试验
+        recover_journals(os.path.join('data', 'raw'))
+        
+        # 初始化试验索引，并在后台补充索引新增或修改过的文件
+        trial_catalog = TrialCatalog()
+        catalog_thread = Thread(target=trial_catalog.rebuild, args=(os.path.join('data', 'raw'),))
+        catalog_thread.daemon = True
+        catalog_thread.start()
+        
         # 初始化RealSense
         realsense_collector = RealSenseCollector()
         realsense_collector.start()
@@ -412,11 +678,27 @@ if __name__ == '__main__':
         myo_thread.daemon = True
         myo_thread.start()
         
+        # 记录器直接订阅两路采集数据
+        data_recorder.attach(myo_manager, realsense_collector)
+        video_recorder.attach(realsense_collector)
+        
+        # 实时数据由单一发布者分发给所有浏览器客户端
+        telemetry_broker = TelemetryBroker(status_func=get_camera_status)
+        telemetry_broker.attach(myo_manager, realsense_collector)
+        telemetry_broker.start()
+        
+        # 启动后台保存线程
+        save_queue.start()
+        
         # 启动Flask服务器
         app.run(host='0.0.0.0', port=5000, debug=False)
         
     except Exception as e:
         print(f"启动错误: {e}")
     finally:
+        if telemetry_broker:
+            telemetry_broker.stop()
+        # 等待未完成的保存任务
+        save_queue.wait_all()
         if realsense_collector:
             realsense_collector.stop()
\ No newline at end of file
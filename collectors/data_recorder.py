@@ -0,0 +1,241 @@
+import json
+import time
+from collections import deque
+from threading import Lock
+
+import numpy as np
+
+from data_processing.hand_angles import JOINT_NAMES
+from data_processing.emg_features import feature_names as default_feature_names
+from data_processing.onset_detection import SEGMENT_CODES, segment_intervals
+from data_storage.schema import (NUM_EMG_CHANNELS, NUM_HAND_LANDMARKS, HANDEDNESS_CODES, NO_HAND,
+                                 emg_stream_fields, hand_stream_fields, feature_stream_fields,
+                                 segment_stream_fields)
+from data_storage.trial_buffer import TrialBuffer
+
+
+class DataRecorder:
+    """服务端原生速率数据记录器
+
+    直接订阅MyoCollector的EMG样本和RealSenseCollector的处理帧，
+    记录与浏览器是否轮询/get_data无关。EMG和手部数据分别以各自的原生速率
+    写入预分配的TrialBuffer，按固定大小的数据块流式追加到TrialWriter的
+    emg/和hand/数据流，内存中只保留当前未写出的数据块。
+    MyoCollector实时计算的滑动窗口EMG特征写入features/数据流，
+    肌肉激活起止标记写入segments/数据流。
+
+    arm()进入待触发状态：各数据流只在内存中保留最近的数据，
+    检测到激活开始时从开始前pre_trigger秒起写入文件，之后与start()相同。
+    """
+
+    def __init__(self, joint_names=JOINT_NAMES, num_channels=NUM_EMG_CHANNELS, feature_names=None):
+        self.lock = Lock()
+        self.joint_names = list(joint_names)
+        self.num_channels = num_channels
+        self.feature_names = list(feature_names or default_feature_names())
+        self.is_recording = False
+        self.armed = False
+        self.pre_trigger = 0.0
+        self.trigger_time = None
+        self.start_time = None
+        self.writer = None
+        self.journal = None
+
+        self.streams = {
+            'emg': emg_stream_fields(num_channels),
+            'hand': hand_stream_fields(len(self.joint_names)),
+            'features': feature_stream_fields(len(self.feature_names), num_channels),
+            'segments': segment_stream_fields()
+        }
+        # 当前未写出的数据块
+        self.buffers = {stream: TrialBuffer(fields) for stream, fields in self.streams.items()}
+        # 待触发时保留的最近数据行
+        self.held_rows = {stream: deque() for stream in self.streams}
+        # 本次记录的激活标记[(编码, 时间戳)]
+        self.segment_markers = []
+        self.sample_counts = {stream: 0 for stream in self.streams}
+        self.no_hand_angles = np.full(len(self.joint_names), np.nan, dtype=np.float32)
+        self.no_hand_landmarks = np.full((NUM_HAND_LANDMARKS, 3), np.nan, dtype=np.float32)
+
+    def attach(self, myo_manager=None, realsense_collector=None):
+        """订阅采集器数据流"""
+        if myo_manager:
+            myo_manager.add_emg_listener(self.on_emg_sample)
+            myo_manager.add_feature_listener(self.on_features)
+            myo_manager.add_segment_listener(self.on_segment)
+        if realsense_collector:
+            realsense_collector.add_frame_listener(self.on_hand_frame)
+
+    def detach(self, myo_manager=None, realsense_collector=None):
+        """取消订阅采集器数据流"""
+        if myo_manager:
+            myo_manager.remove_emg_listener(self.on_emg_sample)
+            myo_manager.remove_feature_listener(self.on_features)
+            myo_manager.remove_segment_listener(self.on_segment)
+        if realsense_collector:
+            realsense_collector.remove_frame_listener(self.on_hand_frame)
+
+    def dataset_attrs(self):
+        """写入器需要附加到数据集上的属性"""
+        return {
+            'hand/angles': {'joint_names': [str(name) for name in self.joint_names]},
+            'hand/handedness': {'codes': json.dumps(HANDEDNESS_CODES), 'no_hand': NO_HAND},
+            'features/values': {'feature_names': [str(name) for name in self.feature_names]},
+            'segments/kind': {'codes': json.dumps(SEGMENT_CODES)}
+        }
+
+    def static_datasets(self):
+        """写入器需要一次性写入的数据集"""
+        return {
+            'hand/joint_names': [str(name) for name in self.joint_names]
+        }
+
+    def _reset(self, writer, journal):
+        for buffer in self.buffers.values():
+            buffer.clear()
+        for rows in self.held_rows.values():
+            rows.clear()
+        self.writer = writer
+        self.journal = journal
+        self.sample_counts = {stream: 0 for stream in self.buffers}
+        self.segment_markers = []
+        self.trigger_time = None
+        self.start_time = time.time()
+
+    def start(self, writer, journal=None):
+        """开始新的记录，数据写入给定的TrialWriter，并同时写入预写日志"""
+        with self.lock:
+            self._reset(writer, journal)
+            self.armed = False
+            self.is_recording = True
+
+    def arm(self, writer, journal=None, pre_trigger=0.5):
+        """等待激活开始后再自动开始记录，并保留开始前pre_trigger秒的数据"""
+        with self.lock:
+            self._reset(writer, journal)
+            self.pre_trigger = pre_trigger
+            self.is_recording = False
+            self.armed = True
+
+    def stop(self):
+        """停止记录，写出剩余数据块并返回(writer, journal)（由调用者关闭）"""
+        with self.lock:
+            self.is_recording = False
+            self.armed = False
+            for rows in self.held_rows.values():
+                rows.clear()
+            for stream in self.buffers:
+                self._flush(stream)
+            writer, journal = self.writer, self.journal
+            self.writer = None
+            self.journal = None
+        return writer, journal
+
+    def _append(self, stream, *values):
+        buffer = self.buffers[stream]
+        buffer.append(*values)
+        if self.journal is not None:
+            self.journal.append(stream, *values)
+        self.sample_counts[stream] += 1
+        if len(buffer) >= self.writer.block_size(stream):
+            self._flush(stream)
+
+    def _hold(self, stream, *values):
+        """待触发时只保留最近的数据行（各数据流第一个字段均为时间戳）
+
+        激活开始要持续一段时间才被确认，标记时间早于确认时刻，因此多保留1秒。
+        """
+        rows = self.held_rows[stream]
+        rows.append(values)
+        while rows and rows[0][0] < values[0] - self.pre_trigger - 1.0:
+            rows.popleft()
+
+    def _record(self, stream, *values):
+        if self.is_recording:
+            self._append(stream, *values)
+        elif self.armed:
+            self._hold(stream, *values)
+
+    def _trigger(self, onset_time):
+        """检测到激活开始：写出开始前pre_trigger秒以来保留的数据并开始记录"""
+        self.armed = False
+        self.is_recording = True
+        self.trigger_time = onset_time
+        for stream, rows in self.held_rows.items():
+            for values in rows:
+                if values[0] >= onset_time - self.pre_trigger:
+                    self._append(stream, *values)
+            rows.clear()
+        self.writer.set_attrs('metadata', {'auto_start_onset_time': onset_time})
+        if self.journal is not None:
+            self.journal.set_attrs('metadata', {'auto_start_onset_time': onset_time})
+
+    def _flush(self, stream):
+        buffer = self.buffers[stream]
+        if self.writer is None or len(buffer) == 0:
+            return
+        self.writer.append(stream, *buffer.view())
+        buffer.clear()
+
+    def on_emg_sample(self, timestamp, raw_emg, filtered_emg):
+        """EMG样本回调（Myo采集线程）"""
+        if not (self.is_recording or self.armed):
+            return
+        with self.lock:
+            self._record('emg', timestamp, raw_emg, filtered_emg)
+
+    def on_features(self, timestamp, values):
+        """EMG特征回调（Myo采集线程）"""
+        if not (self.is_recording or self.armed):
+            return
+        with self.lock:
+            self._record('features', timestamp, values)
+
+    def on_segment(self, kind, timestamp):
+        """激活起止标记回调（Myo采集线程）；待触发时激活开始即开始记录"""
+        if not (self.is_recording or self.armed):
+            return
+        code = SEGMENT_CODES[kind]
+        with self.lock:
+            if self.armed and kind == 'onset':
+                self._trigger(timestamp)
+            if self.is_recording:
+                self.segment_markers.append((code, timestamp))
+                self._append('segments', timestamp, code)
+
+    def activation_intervals(self, end_time=None):
+        """本次记录的激活区间(M, 2)；仍处于激活的区间以end_time结束"""
+        with self.lock:
+            return segment_intervals(self.segment_markers, end_time)
+
+    def on_hand_frame(self, frame_info):
+        """相机帧回调（RealSense处理线程），每个相机帧都记录一行"""
+        if not (self.is_recording or self.armed):
+            return
+        hand_data = frame_info['hand_data']
+        if hand_data:
+            angles = np.array([hand_data.get(name, np.nan) for name in self.joint_names],
+                              dtype=np.float32)
+        else:
+            angles = self.no_hand_angles
+        landmarks = frame_info.get('landmarks')
+        if landmarks is None:
+            landmarks = self.no_hand_landmarks
+            handedness = NO_HAND
+        else:
+            handedness = HANDEDNESS_CODES.get(frame_info.get('handedness'), NO_HAND)
+        with self.lock:
+            self._record('hand', frame_info['timestamp'], angles, landmarks,
+                         handedness, frame_info.get('hand_score', 0.0))
+
+    def get_status(self):
+        with self.lock:
+            return {
+                'is_recording': self.is_recording,
+                'armed': self.armed,
+                'trigger_time': self.trigger_time,
+                'emg_samples': self.sample_counts.get('emg', 0),
+                'hand_frames': self.sample_counts.get('hand', 0),
+                'feature_frames': self.sample_counts.get('features', 0),
+                'segment_markers': len(self.segment_markers)
+            }
@@ -4,16 +4,25 @@ import time
 from collections import deque
 from datetime import datetime
 from data_processing.emg_filter import EMGFilter
+from data_processing.emg_features import EMGFeatureExtractor
+from data_processing.onset_detection import ActivationDetector
 
 class MyoCollector(myo.DeviceListener):
-    def __init__(self):
+    def __init__(self, emg_batch_size=4):
         super().__init__()
         self.lock = Lock()
         self.connected = False
         self.synced = False
         
-        # 初始化滤波器
+        # 初始化滤波器；样本攒够emg_batch_size个后整块滤波（200Hz下4个样本约20ms）
         self.emg_filter = EMGFilter()
+        self.emg_batch_size = emg_batch_size
+        self.pending_emg = []
+        
+        # 滤波后的滑动窗口特征
+        self.feature_extractor = EMGFeatureExtractor()
+        # 肌肉激活起止检测
+        self.activation_detector = ActivationDetector()
         
         # 初始化数据
         self.raw_emg = [0] * 8
@@ -26,7 +35,73 @@ class MyoCollector(myo.DeviceListener):
         self.last_frame_time = time.time()
         self.current_fps = 0
         
-
+        # 原生速率EMG样本订阅者
+        self.emg_listeners = []
+        # EMG特征订阅者（每hop个样本一帧）
+        self.feature_listeners = []
+        # 激活起止标记订阅者
+        self.segment_listeners = []
+        
+    def add_emg_listener(self, callback):
+        """注册EMG样本回调 callback(timestamp, raw_emg, filtered_emg)"""
+        with self.lock:
+            if callback not in self.emg_listeners:
+                self.emg_listeners.append(callback)
+                
+    def remove_emg_listener(self, callback):
+        """注销EMG样本回调"""
+        with self.lock:
+            if callback in self.emg_listeners:
+                self.emg_listeners.remove(callback)
+        
+    def add_feature_listener(self, callback):
+        """注册特征回调 callback(timestamp, features)，features为(特征数, 通道数)数组"""
+        with self.lock:
+            if callback not in self.feature_listeners:
+                self.feature_listeners.append(callback)
+                
+    def remove_feature_listener(self, callback):
+        with self.lock:
+            if callback in self.feature_listeners:
+                self.feature_listeners.remove(callback)
+        
+    def add_segment_listener(self, callback):
+        """注册激活标记回调 callback(kind, timestamp)，kind为'onset'或'offset'"""
+        with self.lock:
+            if callback not in self.segment_listeners:
+                self.segment_listeners.append(callback)
+                
+    def remove_segment_listener(self, callback):
+        with self.lock:
+            if callback in self.segment_listeners:
+                self.segment_listeners.remove(callback)
+                
+    def recalibrate_activation(self):
+        """重新估计静息基线（受试者放松时调用）"""
+        with self.lock:
+            self.activation_detector.reset()
+            
+    def get_activation_status(self):
+        with self.lock:
+            return self.activation_detector.get_status()
+            
+    def set_filter_pipeline(self, pipeline):
+        """切换滤波管线；设计参数不变时保留滤波器状态，否则从零状态重新开始"""
+        emg_filter = EMGFilter.from_pipeline(pipeline, self.emg_filter.num_channels)
+        with self.lock:
+            if emg_filter.pipeline == self.emg_filter.pipeline:
+                return
+            self.emg_filter = emg_filter
+            # 滤波输出改变后，特征窗口从新的输出重新累积
+            extractor = self.feature_extractor
+            self.feature_extractor = EMGFeatureExtractor(
+                extractor.window, extractor.hop, emg_filter.sampling_rate, extractor.num_channels,
+                extractor.bands, extractor.zc_threshold, extractor.ssc_threshold)
+            self.activation_detector.reset()
+            
+    def get_filter_pipeline(self):
+        with self.lock:
+            return self.emg_filter.pipeline
         
     def on_connected(self, event):
         print("Myo已连接")
@@ -38,6 +113,7 @@ class MyoCollector(myo.DeviceListener):
         print("Myo已断开连接")
         self.connected = False
         self.synced = False
+        self.flush()
         
     def on_arm_synced(self, event):
         print("Myo已同步")
@@ -65,16 +141,57 @@ class MyoCollector(myo.DeviceListener):
                 self.frame_count = 0
                 self.last_frame_time = current_time
             
-            # 获取原始数据
-            raw_data = list(event.emg)
-            self.raw_emg = raw_data
-    
-            # 更新滤波器缓冲区
-            self.emg_filter.update_buffer(self.raw_emg)
+            # 获取原始数据，攒够一批后再滤波
+            self.pending_emg.append((current_time, list(event.emg)))
+            if len(self.pending_emg) < self.emg_batch_size:
+                return
+            pending = self._filter_pending()
             
-            # 应用滤波
-            filtered_data = self.emg_filter.filter_data()
-            self.filtered_emg = filtered_data.tolist()
+        self._notify(*pending)
+        
+    def _filter_pending(self):
+        """对待处理样本整块滤波，更新特征和激活检测（需持有锁）
+
+        返回(输出, 订阅者)：输出为{'emg': [(时间戳, 原始, 滤波)], 'features': [(时间戳, 特征)],
+        'segments': [(类型, 时间戳)]}，订阅者为各类订阅者列表的副本
+        """
+        batch = self.pending_emg
+        self.pending_emg = []
+        outputs = {'emg': [], 'features': [], 'segments': []}
+        listeners = {
+            'emg': list(self.emg_listeners),
+            'features': list(self.feature_listeners),
+            'segments': list(self.segment_listeners)
+        }
+        if not batch:
+            return outputs, listeners
+        # (n, 8)数据块沿样本轴一次完成所有通道的滤波
+        filtered_block = self.emg_filter.process([raw for _, raw in batch])
+        timestamps = [timestamp for timestamp, _ in batch]
+        outputs['features'] = self.feature_extractor.update(filtered_block, timestamps)
+        outputs['segments'] = self.activation_detector.update(filtered_block, timestamps)
+        filtered_block = filtered_block.tolist()
+        self.raw_emg = batch[-1][1]
+        self.filtered_emg = filtered_block[-1]
+        outputs['emg'] = [(timestamp, raw, filtered)
+                          for (timestamp, raw), filtered in zip(batch, filtered_block)]
+        return outputs, listeners
+        
+    def _notify(self, outputs, listeners):
+        # 在锁外逐条通知订阅者，避免阻塞采集线程
+        for kind, label in (('emg', 'EMG'), ('features', 'EMG特征'), ('segments', '激活标记')):
+            for item in outputs[kind]:
+                for callback in listeners[kind]:
+                    try:
+                        callback(*item)
+                    except Exception as e:
+                        print(f"{label}订阅者处理错误: {e}")
+                    
+    def flush(self):
+        """立即滤波并发送不足一批的剩余样本"""
+        with self.lock:
+            pending = self._filter_pending()
+        self._notify(*pending)
             
     def get_data(self):
         with self.lock:
@@ -152,6 +269,52 @@ class MyoManager:
                 print(f"采集错误: {e}")
                 time.sleep(1)
     
+    def add_emg_listener(self, callback):
+        if self.collector:
+            self.collector.add_emg_listener(callback)
+            
+    def remove_emg_listener(self, callback):
+        if self.collector:
+            self.collector.remove_emg_listener(callback)
+    
+    def add_feature_listener(self, callback):
+        if self.collector:
+            self.collector.add_feature_listener(callback)
+            
+    def remove_feature_listener(self, callback):
+        if self.collector:
+            self.collector.remove_feature_listener(callback)
+            
+    def flush(self):
+        if self.collector:
+            self.collector.flush()
+            
+    def add_segment_listener(self, callback):
+        if self.collector:
+            self.collector.add_segment_listener(callback)
+            
+    def remove_segment_listener(self, callback):
+        if self.collector:
+            self.collector.remove_segment_listener(callback)
+            
+    def recalibrate_activation(self):
+        if self.collector:
+            self.collector.recalibrate_activation()
+            
+    def get_activation_status(self):
+        if not self.collector:
+            return None
+        return self.collector.get_activation_status()
+            
+    def set_filter_pipeline(self, pipeline):
+        if self.collector:
+            self.collector.set_filter_pipeline(pipeline)
+            
+    def get_filter_pipeline(self):
+        if not self.collector:
+            return None
+        return self.collector.get_filter_pipeline()
+    
     def get_latest_data(self):
         if not self.collector:
             return {'raw_emg': [0] * 8, 'filtered_emg': [0] * 8}
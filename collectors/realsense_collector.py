@@ -2,10 +2,22 @@ import cv2
 import mediapipe as mp
 import pyrealsense2 as rs
 import numpy as np
-from threading import Lock
+from threading import Lock, Condition
 from data_processing.hand_angles import HandAngleCalculator
 import time
 
+# 默认的JPEG规格(质量, 缩放比例)
+DEFAULT_JPEG_VARIANT = (80, 1.0)
+
+
+def encode_jpeg(image, quality, scale):
+    """按给定质量和缩放比例编码JPEG，失败时返回None"""
+    if scale != 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    return buffer.tobytes() if ok else None
+
+
 class RealSenseCollector:
     def __init__(self):
         # 初始化RealSense
@@ -29,8 +41,17 @@ class RealSenseCollector:
         self.calculator = HandAngleCalculator()
         
         self.frame = None
+        self.frame_index = 0
         self.hand_data = None
         self.lock = Lock()
+        # 新帧到达时通知等待中的视频流
+        self.frame_condition = Condition(self.lock)
+        
+        # 共享JPEG缓存：每个新帧按客户端使用中的(质量, 缩放)规格各编码一次，
+        # 使用相同规格的视频流客户端共用
+        self.jpeg_consumers = {}
+        self.jpegs = {}
+        self.jpeg_index = 0
         self.is_running = False
 
         # 帧率计算相关变量
@@ -40,6 +61,29 @@ class RealSenseCollector:
         self.last_fps_update = time.time()
         self.fps_update_interval = 1.0  # 每秒更新一次帧率
         
+        # 逐帧处理结果订阅者
+        self.frame_listeners = []
+        # 需要未标注原始图像的订阅者（如视频录制）
+        self.image_listeners = []
+        
+    def add_frame_listener(self, callback, with_image=False):
+        """注册帧回调 callback(frame_info)
+
+        with_image为True时，frame_info['color_image']为绘制标注前的原始彩色图像副本，
+        订阅者之间共享，只读使用。
+        """
+        with self.lock:
+            listeners = self.image_listeners if with_image else self.frame_listeners
+            if callback not in listeners:
+                listeners.append(callback)
+                
+    def remove_frame_listener(self, callback):
+        """注销帧回调"""
+        with self.lock:
+            for listeners in (self.frame_listeners, self.image_listeners):
+                if callback in listeners:
+                    listeners.remove(callback)
+        
     def start(self):
         print("启动RealSense相机...")
         self.pipeline.start(self.config)
@@ -56,6 +100,32 @@ class RealSenseCollector:
         with self.lock:
             return self.frame.copy() if self.frame is not None else None
             
+    def add_jpeg_consumer(self, variant=DEFAULT_JPEG_VARIANT):
+        """视频流客户端开始使用某个(质量, 缩放)规格，有客户端时相机线程才编码该规格"""
+        with self.lock:
+            self.jpeg_consumers[variant] = self.jpeg_consumers.get(variant, 0) + 1
+            
+    def remove_jpeg_consumer(self, variant=DEFAULT_JPEG_VARIANT):
+        with self.lock:
+            count = self.jpeg_consumers.get(variant, 0) - 1
+            if count > 0:
+                self.jpeg_consumers[variant] = count
+            else:
+                self.jpeg_consumers.pop(variant, None)
+                self.jpegs.pop(variant, None)
+            
+    def wait_for_jpeg(self, last_index=None, variant=DEFAULT_JPEG_VARIANT, timeout=1.0):
+        """等待比last_index更新的JPEG帧，返回(帧序号, JPEG字节)；超时返回(last_index, None)
+
+        返回的bytes为不可变的共享缓存，调用者不应修改。
+        """
+        with self.lock:
+            self.frame_condition.wait_for(
+                lambda: variant in self.jpegs and self.jpeg_index != last_index, timeout)
+            if variant not in self.jpegs or self.jpeg_index == last_index:
+                return last_index, None
+            return self.jpeg_index, self.jpegs[variant]
+            
     def get_hand_data(self):
         with self.lock:
             return self.hand_data.copy() if self.hand_data is not None else None
@@ -87,24 +157,36 @@ class RealSenseCollector:
                 self.last_fps_update = current_time
 
             color_image = np.asanyarray(color_frame.get_data())
+            # 绘制标注前保留原始图像，仅在有订阅者需要时复制
+            raw_image = color_image.copy() if self.image_listeners else None
             results = self.hands.process(cv2.cvtColor(color_image, cv2.COLOR_BGR2RGB))
             
-
+            # 原始关键点、左右手和检测置信度
+            landmarks = None
+            handedness = None
+            hand_score = 0.0
             
             if results.multi_hand_landmarks:
-                for hand_landmarks in results.multi_hand_landmarks:
+                for hand_index, hand_landmarks in enumerate(results.multi_hand_landmarks):
+                    landmarks = np.array(
+                        [[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark], dtype=np.float32)
+                    if results.multi_handedness:
+                        classification = results.multi_handedness[hand_index].classification[0]
+                        handedness = classification.label
+                        hand_score = classification.score
+                    
                     # 绘制手部关键点
                     self.mp_drawing.draw_landmarks(
                         color_image,
                         hand_landmarks,
                         self.mp_hands.HAND_CONNECTIONS)
                     
-                    # 计算并绘制手部坐标系
-                    origin, rotation_matrix = self.calculator.create_hand_coordinate_system(hand_landmarks)
+                    # 计算并绘制手部坐标系（直接使用关键点数组）
+                    origin, rotation_matrix = self.calculator.create_hand_coordinate_system(landmarks)
                     self.calculator.draw_hand_coordinate_system(color_image, origin, rotation_matrix)
                     
                     # 计算关节角度
-                    angles = self.calculator.calculate_joint_angles(hand_landmarks)
+                    angles = self.calculator.calculate_joint_angles(landmarks)
                     
                     # 绘制手部关键点和连接线
                     self.mp_drawing.draw_landmarks(
@@ -124,8 +206,47 @@ class RealSenseCollector:
                     self.hand_data = None
 
                                
+            # 每个使用中的规格编码一次，供使用该规格的所有客户端共享
+            with self.lock:
+                variants = list(self.jpeg_consumers)
+            jpegs = {}
+            for variant in variants:
+                jpeg = encode_jpeg(color_image, *variant)
+                if jpeg is not None:
+                    jpegs[variant] = jpeg
+                               
             with self.lock:
                 self.frame = color_image
+                self.frame_index = self.total_frames
+                if jpegs:
+                    self.jpegs = jpegs
+                    self.jpeg_index = self.total_frames
+                    self.frame_condition.notify_all()
+                frame_info = {
+                    'timestamp': current_time,
+                    'frame_index': self.total_frames,
+                    'hand_data': self.hand_data.copy() if self.hand_data is not None else None,
+                    'landmarks': landmarks,
+                    'handedness': handedness,
+                    'hand_score': hand_score
+                }
+                listeners = list(self.frame_listeners)
+                image_listeners = list(self.image_listeners)
+                
+            # 通知订阅者（每个处理完成的相机帧都会到达）
+            for callback in listeners:
+                try:
+                    callback(frame_info)
+                except Exception as e:
+                    print(f"帧订阅者处理错误: {e}")
+            
+            if image_listeners and raw_image is not None:
+                image_frame_info = dict(frame_info, color_image=raw_image)
+                for callback in image_listeners:
+                    try:
+                        callback(image_frame_info)
+                    except Exception as e:
+                        print(f"帧订阅者处理错误: {e}")
                 
         except Exception as e:
             print(f"处理帧错误: {e}")
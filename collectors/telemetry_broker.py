@@ -0,0 +1,231 @@
+import time
+from collections import deque
+from threading import Thread, Lock, Condition
+
+
+class TelemetryMessage:
+    """一条发布给所有订阅者的消息，按编码器类型缓存编码结果"""
+
+    __slots__ = ('kind', 'data', 'encoded')
+
+    def __init__(self, kind, data):
+        self.kind = kind
+        self.data = data
+        self.encoded = {}
+
+    def encode(self, encoder):
+        """同一格式的消息只编码一次，由所有使用该格式的订阅者共享"""
+        key = type(encoder)
+        if key not in self.encoded:
+            self.encoded[key] = getattr(encoder, self.kind)(self.data)
+        return self.encoded[key]
+
+
+class TelemetrySubscriber:
+    """订阅者的有界消息队列，已满时丢弃最旧的消息"""
+
+    def __init__(self, max_queue=64):
+        self.queue = deque(maxlen=max_queue)
+        self.condition = Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, message):
+        with self.condition:
+            if len(self.queue) == self.queue.maxlen:
+                self.dropped += 1
+            self.queue.append(message)
+            self.condition.notify()
+
+    def get(self, timeout=1.0):
+        """取出所有待发送消息，没有消息时最多等待timeout秒"""
+        with self.condition:
+            self.condition.wait_for(lambda: self.queue or self.closed, timeout)
+            messages = list(self.queue)
+            self.queue.clear()
+        return messages
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+
+
+class TelemetryBroker:
+    """实时数据的单一发布者
+
+    只向MyoCollector和RealSenseCollector各注册一个订阅，采集线程回调中只做入队。
+    发布线程每个tick汇总一次新数据（EMG样本批、逐帧手部数据、EMG特征帧、
+    激活起止标记，以及每秒一次的设备状态），分发到各订阅者的有界队列。增加观看页面不会增加采集线程的负担，
+    慢速客户端只会丢失自己最旧的消息。
+
+    每个有新数据的tick分配一个递增序号，并保留最近history_size个tick的消息，
+    轮询客户端可用get_since按序号游标只取增量。
+    """
+
+    def __init__(self, tick_interval=0.03, status_interval=1.0, max_pending=2000, status_func=None,
+                 history_size=200):
+        self.lock = Lock()
+        self.tick_condition = Condition(self.lock)
+        self.tick_interval = tick_interval
+        self.status_interval = status_interval
+        self.status_func = status_func
+        self.emg_samples = deque(maxlen=max_pending)
+        self.hand_frames = deque(maxlen=max(1, int(max_pending / 20)))
+        self.feature_frames = deque(maxlen=max(1, int(max_pending / 10)))
+        self.segment_markers = deque(maxlen=100)
+        self.subscribers = []
+        self.seq = 0
+        self.history = deque(maxlen=history_size)
+        self.is_running = False
+        self.worker = None
+
+        # 最近一次的数据快照，供/get_data轮询使用
+        self.latest = {
+            'emg_data': {'raw_emg': [0] * 8, 'filtered_emg': [0] * 8},
+            'hand_data': None,
+            'status': {}
+        }
+
+    def attach(self, myo_manager=None, realsense_collector=None):
+        if myo_manager:
+            myo_manager.add_emg_listener(self.on_emg_sample)
+            myo_manager.add_feature_listener(self.on_features)
+            myo_manager.add_segment_listener(self.on_segment)
+        if realsense_collector:
+            realsense_collector.add_frame_listener(self.on_hand_frame)
+
+    def detach(self, myo_manager=None, realsense_collector=None):
+        if myo_manager:
+            myo_manager.remove_emg_listener(self.on_emg_sample)
+            myo_manager.remove_feature_listener(self.on_features)
+            myo_manager.remove_segment_listener(self.on_segment)
+        if realsense_collector:
+            realsense_collector.remove_frame_listener(self.on_hand_frame)
+
+    def start(self):
+        if self.is_running:
+            return
+        self.is_running = True
+        self.worker = Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def stop(self):
+        self.is_running = False
+        if self.worker:
+            self.worker.join()
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.tick_condition.notify_all()
+        for subscriber in subscribers:
+            subscriber.close()
+
+    def subscribe(self, max_queue=64):
+        subscriber = TelemetrySubscriber(max_queue)
+        with self.lock:
+            self.subscribers.append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            if subscriber in self.subscribers:
+                self.subscribers.remove(subscriber)
+        subscriber.close()
+
+    def on_emg_sample(self, timestamp, raw_emg, filtered_emg):
+        """EMG样本回调（Myo采集线程），只入队"""
+        with self.lock:
+            self.emg_samples.append((timestamp, raw_emg, filtered_emg))
+
+    def on_features(self, timestamp, values):
+        """EMG特征回调（Myo采集线程），只入队"""
+        with self.lock:
+            self.feature_frames.append((timestamp, values))
+
+    def on_segment(self, kind, timestamp):
+        """激活起止标记回调（Myo采集线程），只入队"""
+        with self.lock:
+            self.segment_markers.append((kind, timestamp))
+
+    def on_hand_frame(self, frame_info):
+        """相机帧回调（RealSense处理线程），只入队"""
+        with self.lock:
+            self.hand_frames.append({
+                'timestamp': frame_info['timestamp'],
+                'frame_index': frame_info['frame_index'],
+                'hand_data': frame_info['hand_data']
+            })
+
+    def get_latest(self):
+        with self.lock:
+            return dict(self.latest, seq=self.seq)
+
+    def get_since(self, since, timeout=1.0):
+        """返回序号since之后的(最新序号, 消息列表)，没有新数据时最多等待timeout秒
+
+        since已超出保留的历史（或大于当前序号，如服务重启）时返回None，调用者应改用完整快照。
+        """
+        with self.lock:
+            if since > self.seq:
+                return None
+            self.tick_condition.wait_for(lambda: self.seq > since or not self.is_running, timeout)
+            if self.seq > since and (not self.history or self.history[0][0] > since + 1):
+                return None
+            messages = [message for seq, tick in self.history if seq > since for message in tick]
+            return self.seq, messages
+
+    def _run(self):
+        last_status = 0.0
+        while self.is_running:
+            time.sleep(self.tick_interval)
+            now = time.time()
+            with_status = self.status_func is not None and now - last_status >= self.status_interval
+            if with_status:
+                last_status = now
+            try:
+                self._publish_tick(with_status)
+            except Exception as e:
+                print(f"遥测发布错误: {e}")
+
+    def _publish_tick(self, with_status):
+        with self.lock:
+            emg_samples = list(self.emg_samples)
+            hand_frames = list(self.hand_frames)
+            feature_frames = list(self.feature_frames)
+            segment_markers = list(self.segment_markers)
+            self.emg_samples.clear()
+            self.hand_frames.clear()
+            self.feature_frames.clear()
+            self.segment_markers.clear()
+            subscribers = list(self.subscribers)
+
+        messages = []
+        if emg_samples:
+            messages.append(TelemetryMessage('emg', emg_samples))
+        for frame in hand_frames:
+            messages.append(TelemetryMessage('hand', frame))
+        if feature_frames:
+            messages.append(TelemetryMessage('features', feature_frames))
+        if segment_markers:
+            messages.append(TelemetryMessage('segments', segment_markers))
+        status = None
+        if with_status:
+            status = self.status_func()
+            messages.append(TelemetryMessage('status', status))
+
+        with self.lock:
+            if emg_samples:
+                _, raw_emg, filtered_emg = emg_samples[-1]
+                self.latest['emg_data'] = {'raw_emg': list(raw_emg), 'filtered_emg': list(filtered_emg)}
+            if hand_frames:
+                self.latest['hand_data'] = hand_frames[-1]['hand_data']
+            if status is not None:
+                self.latest['status'] = status
+            if messages:
+                self.seq += 1
+                self.history.append((self.seq, messages))
+                self.tick_condition.notify_all()
+
+        for subscriber in subscribers:
+            for message in messages:
+                subscriber.put(message)
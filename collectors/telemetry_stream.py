@@ -0,0 +1,161 @@
+import json
+import struct
+
+import numpy as np
+
+from data_processing.hand_angles import JOINT_NAMES
+from data_processing.emg_features import feature_names as default_feature_names
+from data_processing.onset_detection import SEGMENT_CODES
+from data_storage.schema import NUM_EMG_CHANNELS
+
+
+class JsonTelemetryEncoder:
+    """默认的文本编码：每条消息为一个SSE事件，数据为JSON"""
+
+    mimetype = 'text/event-stream'
+
+    def header(self):
+        return "retry: 1000\n\n"
+
+    @staticmethod
+    def _event(event, data):
+        return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+    def emg(self, samples):
+        return self._event('emg', {
+            'timestamps': [sample[0] for sample in samples],
+            'raw_emg': [list(sample[1]) for sample in samples],
+            'filtered_emg': [list(sample[2]) for sample in samples]
+        })
+
+    def hand(self, frame):
+        return self._event('hand', {
+            'timestamp': frame['timestamp'],
+            'frame_index': frame['frame_index'],
+            'hand_data': frame['hand_data'] or {}
+        })
+
+    def features(self, frames):
+        return self._event('features', {
+            'timestamps': [frame[0] for frame in frames],
+            'values': [np.asarray(frame[1]).tolist() for frame in frames]
+        })
+
+    def segments(self, markers):
+        return self._event('segments', {
+            'timestamps': [timestamp for _, timestamp in markers],
+            'kinds': [kind for kind, _ in markers]
+        })
+
+    def status(self, status):
+        return self._event('status', status)
+
+
+class BinaryTelemetryEncoder:
+    """紧凑二进制编码（可选）
+
+    每条消息为 类型(uint8) + 负载长度(uint32) + 负载，全部小端序。
+    负载内各字段按自然对齐排列，前端复制负载后可直接用类型化数组读取：
+      SCHEMA: UTF-8 JSON，连接建立时发送一次
+      EMG:    样本数n(uint32) + 保留(uint32) + 时间戳float64[n]
+              + 滤波EMG float32[n, C] + 原始EMG int8[n, C]
+      HAND:   时间戳float64 + 帧序号uint32 + 是否检测到手uint32 + 角度float32[J]（按joint_names顺序）
+      STATUS: UTF-8 JSON
+      FEATURES: 帧数n(uint32) + 保留(uint32) + 时间戳float64[n] + 特征float32[n, F, C]（按feature_names顺序）
+      SEGMENTS: 标记数n(uint32) + 保留(uint32) + 时间戳float64[n] + 类型uint8[n]（按segment_codes编码）
+    """
+
+    mimetype = 'application/octet-stream'
+    SCHEMA, EMG, HAND, STATUS, FEATURES, SEGMENTS = 0, 1, 2, 3, 4, 5
+
+    def __init__(self, joint_names=JOINT_NAMES, num_channels=NUM_EMG_CHANNELS, feature_names=None):
+        self.joint_names = list(joint_names)
+        self.num_channels = num_channels
+        self.feature_names = list(feature_names or default_feature_names())
+        self.no_hand_angles = np.full(len(self.joint_names), np.nan, dtype=np.float32)
+
+    def _message(self, message_type, payload):
+        return struct.pack('<BI', message_type, len(payload)) + payload
+
+    def header(self):
+        schema = {
+            'version': 1,
+            'num_channels': self.num_channels,
+            'joint_names': self.joint_names,
+            'feature_names': self.feature_names,
+            'segment_codes': SEGMENT_CODES,
+            'message_types': {'schema': self.SCHEMA, 'emg': self.EMG, 'hand': self.HAND,
+                              'status': self.STATUS, 'features': self.FEATURES,
+                              'segments': self.SEGMENTS}
+        }
+        return self._message(self.SCHEMA, json.dumps(schema).encode('utf-8'))
+
+    def emg(self, samples):
+        timestamps = np.array([sample[0] for sample in samples], dtype='<f8')
+        raw = np.array([sample[1] for sample in samples], dtype=np.int8)
+        filtered = np.array([sample[2] for sample in samples], dtype='<f4')
+        payload = b''.join([struct.pack('<II', len(samples), 0), timestamps.tobytes(),
+                            filtered.tobytes(), raw.tobytes()])
+        return self._message(self.EMG, payload)
+
+    def hand(self, frame):
+        hand_data = frame['hand_data']
+        if hand_data:
+            angles = np.array([hand_data.get(name, np.nan) for name in self.joint_names], dtype='<f4')
+        else:
+            angles = self.no_hand_angles
+        payload = struct.pack('<dII', frame['timestamp'], frame['frame_index'],
+                              int(bool(hand_data))) + angles.tobytes()
+        return self._message(self.HAND, payload)
+
+    def features(self, frames):
+        timestamps = np.array([frame[0] for frame in frames], dtype='<f8')
+        values = np.array([frame[1] for frame in frames], dtype='<f4')
+        payload = b''.join([struct.pack('<II', len(frames), 0), timestamps.tobytes(), values.tobytes()])
+        return self._message(self.FEATURES, payload)
+
+    def segments(self, markers):
+        timestamps = np.array([timestamp for _, timestamp in markers], dtype='<f8')
+        kinds = np.array([SEGMENT_CODES[kind] for kind, _ in markers], dtype=np.uint8)
+        payload = b''.join([struct.pack('<II', len(markers), 0), timestamps.tobytes(), kinds.tobytes()])
+        return self._message(self.SEGMENTS, payload)
+
+    def status(self, status):
+        return self._message(self.STATUS, json.dumps(status).encode('utf-8'))
+
+
+TELEMETRY_ENCODERS = {
+    'json': JsonTelemetryEncoder,
+    'binary': BinaryTelemetryEncoder
+}
+
+
+class TelemetrySession:
+    """单个浏览器客户端的推送遥测会话
+
+    从TelemetryBroker订阅消息（EMG样本批、逐帧关节角度和设备状态），
+    按encoder编码后发送（SSE+JSON或紧凑二进制），不直接访问采集器。
+    指定decimator时，EMG样本先按该客户端的显示参数抽取后再发送。
+    """
+
+    def __init__(self, broker, encoder=None, max_queue=64, decimator=None):
+        self.broker = broker
+        self.encoder = encoder or JsonTelemetryEncoder()
+        self.max_queue = max_queue
+        self.decimator = decimator
+
+    def events(self):
+        """消息生成器，客户端断开或代理停止时结束"""
+        subscriber = self.broker.subscribe(self.max_queue)
+        try:
+            yield self.encoder.header()
+            while not subscriber.closed:
+                for message in subscriber.get(timeout=1.0):
+                    if message.kind == 'emg' and self.decimator is not None:
+                        samples = self.decimator.feed(message.data)
+                        if samples:
+                            yield self.encoder.emg(samples)
+                    else:
+                        yield message.encode(self.encoder)
+        finally:
+            self.broker.unsubscribe(subscriber)
@@ -0,0 +1,120 @@
+import time
+
+# 可选的JPEG质量和缩放档位（从高到低），客户端参数会对齐到档位，
+# 使相近设置的客户端共用同一份编码结果
+VIDEO_QUALITY_LEVELS = [90, 80, 70, 60, 50, 40, 30]
+VIDEO_SCALE_LEVELS = [1.0, 0.75, 0.5, 0.25]
+MIN_VIDEO_FPS = 2.0
+
+
+def _level_index(levels, value):
+    """不超过value的最高档位（value低于所有档位时取最低档）"""
+    for i, level in enumerate(levels):
+        if level <= value:
+            return i
+    return len(levels) - 1
+
+
+class AdaptiveVideoStream:
+    """单个客户端的自适应MJPEG视频流
+
+    客户端可指定期望的质量、缩放和最高帧率。每帧发送所用的时间反映该客户端
+    连接的发送积压：发送阻塞超过帧间隔的一定比例时逐级降低质量、缩放和帧率，
+    连续多帧发送顺畅时再逐级恢复，但不超过客户端请求的设置。
+    慢速客户端只会降低自己的画面规格，不影响其他客户端和采集线程。
+    """
+
+    def __init__(self, quality=80, scale=1.0, max_fps=30.0, boundary='frame',
+                 congested_ratio=0.5, idle_ratio=0.15, recover_frames=30, smoothing=0.3):
+        self.boundary = boundary
+        self.max_quality_index = _level_index(VIDEO_QUALITY_LEVELS, quality)
+        self.max_scale_index = _level_index(VIDEO_SCALE_LEVELS, scale)
+        self.requested_fps = max(MIN_VIDEO_FPS, float(max_fps))
+        self.quality_index = self.max_quality_index
+        self.scale_index = self.max_scale_index
+        self.fps = self.requested_fps
+        self.congested_ratio = congested_ratio
+        self.idle_ratio = idle_ratio
+        self.recover_frames = recover_frames
+        self.smoothing = smoothing
+        self.send_time = 0.0
+        self.smooth_frames = 0
+        self.frames_sent = 0
+
+    def variant(self):
+        """当前使用的(质量, 缩放)规格"""
+        return VIDEO_QUALITY_LEVELS[self.quality_index], VIDEO_SCALE_LEVELS[self.scale_index]
+
+    def get_status(self):
+        quality, scale = self.variant()
+        return {'quality': quality, 'scale': scale, 'fps': self.fps,
+                'send_time': self.send_time, 'frames_sent': self.frames_sent}
+
+    def record_send(self, duration):
+        """记录一帧的发送耗时并调整规格"""
+        self.frames_sent += 1
+        self.send_time += self.smoothing * (duration - self.send_time)
+        interval = 1.0 / self.fps
+        if self.send_time > self.congested_ratio * interval:
+            self._degrade()
+            self.smooth_frames = 0
+        elif self.send_time < self.idle_ratio * interval:
+            self.smooth_frames += 1
+            if self.smooth_frames >= self.recover_frames:
+                self._recover()
+                self.smooth_frames = 0
+        else:
+            self.smooth_frames = 0
+
+    def _degrade(self):
+        # 依次降低质量、缩放、帧率
+        if self.quality_index < len(VIDEO_QUALITY_LEVELS) - 1:
+            self.quality_index += 1
+        elif self.scale_index < len(VIDEO_SCALE_LEVELS) - 1:
+            self.scale_index += 1
+        else:
+            self.fps = max(MIN_VIDEO_FPS, self.fps / 2)
+        # 新规格下重新估计发送耗时
+        self.send_time = 0.0
+
+    def _recover(self):
+        # 按相反顺序恢复：帧率、缩放、质量
+        if self.fps < self.requested_fps:
+            self.fps = min(self.requested_fps, self.fps * 2)
+        elif self.scale_index > self.max_scale_index:
+            self.scale_index -= 1
+        elif self.quality_index > self.max_quality_index:
+            self.quality_index -= 1
+
+    def frames(self, collector):
+        """MJPEG multipart生成器，使用相机线程按当前规格共享编码的JPEG"""
+        variant = self.variant()
+        collector.add_jpeg_consumer(variant)
+        try:
+            last_index = None
+            next_send = 0.0
+            while collector.is_running:
+                # 按当前帧率限速，期间到达的旧帧直接跳过
+                delay = next_send - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                frame_index, jpeg = collector.wait_for_jpeg(last_index, variant, timeout=1.0)
+                if jpeg is None:
+                    continue
+                last_index = frame_index
+
+                send_start = time.time()
+                next_send = send_start + 1.0 / self.fps
+                yield (f'--{self.boundary}\r\n'
+                       f'Content-Type: image/jpeg\r\n'
+                       f'Content-Length: {len(jpeg)}\r\n\r\n').encode('ascii') + jpeg + b'\r\n'
+                # 生成器恢复时该帧已写入连接，耗时反映客户端的发送积压
+                self.record_send(time.time() - send_start)
+
+                new_variant = self.variant()
+                if new_variant != variant:
+                    collector.add_jpeg_consumer(new_variant)
+                    collector.remove_jpeg_consumer(variant)
+                    variant = new_variant
+        finally:
+            collector.remove_jpeg_consumer(variant)
@@ -0,0 +1,160 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import h5py
+import numpy as np
+
+from data_processing.emg_filter import (DEFAULT_FILTER_CHAIN, design_filter_chain,
+                                       normalize_filter_pipeline, apply_filter_pipeline)
+from data_storage.schema import CHUNK_ROWS, dataset_options, schema_paths, decode_attr
+
+
+def trial_filter_pipeline(f):
+    """试验文件元数据中记录的在线滤波管线（旧文件没有时返回None）"""
+    if 'metadata' not in f or 'filter_pipeline' not in f['metadata'].attrs:
+        return None
+    return normalize_filter_pipeline(json.loads(decode_attr(f['metadata'].attrs['filter_pipeline'])))
+
+
+def process_file(path, name, chain, sampling_rate, overwrite=False, from_metadata=False, zero_phase=True):
+    """对单个试验文件的原始EMG滤波，结果写入processed/<name>数据集
+
+    from_metadata=True时使用文件记录的在线滤波管线（没有记录时使用chain），
+    zero_phase=False时做与在线滤波相同的因果滤波。
+    """
+    start = time.perf_counter()
+    with h5py.File(path, 'r+') as f:
+        pipeline = trial_filter_pipeline(f) if from_metadata else None
+        pipeline = pipeline or normalize_filter_pipeline(
+            {'sampling_rate': sampling_rate, 'stages': chain, 'output': 'filtered'})
+        sos = design_filter_chain(pipeline['stages'], pipeline['sampling_rate'])
+        paths = schema_paths(f)
+        raw_path, group_path = paths['emg_raw'], paths['processed']
+        if raw_path not in f:
+            return {'path': path, 'status': 'skipped', 'message': '没有原始EMG数据'}
+        target = f'{group_path}/{name}'
+        if target in f:
+            if not overwrite:
+                return {'path': path, 'status': 'skipped', 'message': f'{target}已存在'}
+            del f[target]
+
+        raw = f[raw_path][:]
+        # sosfiltfilt需要足够长的信号做边界延拓
+        padlen = 3 * (2 * len(sos) + 1)
+        if raw.ndim != 2 or (zero_phase and len(raw) <= padlen):
+            return {'path': path, 'status': 'skipped', 'message': f'样本数不足({len(raw)})'}
+
+        filtered = apply_filter_pipeline(raw, pipeline, zero_phase).astype(np.float32)
+        compression = f.attrs.get('compression', 'none')
+        if isinstance(compression, bytes):
+            compression = compression.decode('utf-8')
+        options = dataset_options(compression)
+        if options:
+            options['chunks'] = (min(CHUNK_ROWS['emg'], len(filtered)), filtered.shape[1])
+        dataset = f.require_group(group_path).create_dataset(name, data=filtered, **options)
+        dataset.attrs['source'] = raw_path
+        dataset.attrs['filter_chain'] = json.dumps(pipeline['stages'])
+        dataset.attrs['filter_pipeline'] = json.dumps(pipeline, sort_keys=True)
+        dataset.attrs['sampling_rate'] = pipeline['sampling_rate']
+        dataset.attrs['zero_phase'] = zero_phase
+        dataset.attrs['processed_time'] = time.time()
+
+    return {
+        'path': path,
+        'status': 'done',
+        'samples': raw.shape[0],
+        'channels': raw.shape[1],
+        'seconds': time.perf_counter() - start
+    }
+
+
+def _process_file_job(args):
+    path = args[0]
+    try:
+        return process_file(*args)
+    except Exception as e:
+        return {'path': path, 'status': 'error', 'message': str(e)}
+
+
+def process_directory(root, name, chain=DEFAULT_FILTER_CHAIN, sampling_rate=200,
+                      workers=None, overwrite=False, from_metadata=False, zero_phase=True):
+    """用进程池并行处理root下所有试验文件，返回逐文件结果和总吞吐量"""
+    paths = sorted(glob.glob(os.path.join(root, '**', '*.h5'), recursive=True))
+    start = time.perf_counter()
+    jobs = [(path, name, chain, sampling_rate, overwrite, from_metadata, zero_phase) for path in paths]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(_process_file_job, jobs))
+    elapsed = time.perf_counter() - start
+
+    samples = sum(r.get('samples', 0) for r in results if r['status'] == 'done')
+    channel_samples = sum(r.get('samples', 0) * r.get('channels', 0)
+                          for r in results if r['status'] == 'done')
+    return results, {
+        'files': len(paths),
+        'processed': sum(r['status'] == 'done' for r in results),
+        'samples': samples,
+        'seconds': elapsed,
+        'samples_per_sec': samples / elapsed if elapsed > 0 else 0.0,
+        'channel_samples_per_sec': channel_samples / elapsed if elapsed > 0 else 0.0
+    }
+
+
+def parse_chain(args):
+    """由命令行参数组成滤波链（--chain JSON优先）"""
+    if args.chain:
+        with open(args.chain, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    chain = []
+    if args.highpass:
+        chain.append({'type': 'highpass', 'cutoff': args.highpass, 'order': args.order})
+    if args.lowpass:
+        chain.append({'type': 'lowpass', 'cutoff': args.lowpass, 'order': args.order})
+    if args.bandpass:
+        chain.append({'type': 'bandpass', 'low': args.bandpass[0], 'high': args.bandpass[1],
+                      'order': args.order})
+    if args.notch:
+        chain.append({'type': 'notch', 'freq': args.notch, 'q': args.notch_q})
+    return chain or DEFAULT_FILTER_CHAIN
+
+
+def main():
+    parser = argparse.ArgumentParser(description='离线批量EMG滤波（默认零相位）')
+    parser.add_argument('--root', default=os.path.join('data', 'raw'), help='试验数据根目录')
+    parser.add_argument('--name', default='zero_phase', help='结果数据集名称（写入processed/<name>）')
+    parser.add_argument('--chain', help='滤波链JSON文件')
+    parser.add_argument('--bandpass', type=float, nargs=2, metavar=('LOW', 'HIGH'), help='带通频率(Hz)')
+    parser.add_argument('--highpass', type=float, help='高通截止频率(Hz)')
+    parser.add_argument('--lowpass', type=float, help='低通截止频率(Hz)')
+    parser.add_argument('--notch', type=float, help='陷波频率(Hz)')
+    parser.add_argument('--notch-q', type=float, default=30, help='陷波品质因数')
+    parser.add_argument('--order', type=int, default=2, help='Butterworth阶数')
+    parser.add_argument('--fs', type=float, default=200, help='EMG采样率(Hz)')
+    parser.add_argument('--workers', type=int, help='进程数（默认CPU核数）')
+    parser.add_argument('--overwrite', action='store_true', help='覆盖已存在的同名结果')
+    parser.add_argument('--from-metadata', action='store_true',
+                        help='使用各文件记录的在线滤波管线（没有记录的文件使用命令行滤波链）')
+    parser.add_argument('--causal', action='store_true', help='因果滤波（与在线滤波相同），而非零相位滤波')
+    args = parser.parse_args()
+
+    chain = parse_chain(args)
+    print(f"滤波链: {json.dumps(chain, ensure_ascii=False)}")
+    results, summary = process_directory(args.root, args.name, chain, args.fs,
+                                         workers=args.workers, overwrite=args.overwrite,
+                                         from_metadata=args.from_metadata, zero_phase=not args.causal)
+    for result in results:
+        if result['status'] == 'done':
+            print(f"{result['path']}: {result['samples']} 样本 × {result['channels']} 通道, "
+                  f"{result['seconds'] * 1000:.1f} ms")
+        else:
+            print(f"{result['path']}: {result['status']} {result.get('message', '')}")
+    print(f"\n共处理 {summary['processed']}/{summary['files']} 个文件, {summary['samples']} 样本, "
+          f"耗时 {summary['seconds']:.2f} 秒, 吞吐量 {summary['samples_per_sec']:.0f} 样本/秒 "
+          f"({summary['channel_samples_per_sec']:.0f} 通道样本/秒)")
+
+
+if __name__ == '__main__':
+    main()
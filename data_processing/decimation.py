@@ -0,0 +1,177 @@
+import numpy as np
+
+DECIMATION_MODES = ('minmax', 'lttb')
+
+
+def _bucket_edges(n, n_buckets):
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def _minmax_bucket(timestamps, values):
+    """单个数据块的最小/最大值，按出现先后排列；返回(2,)时间戳和(2, C)数值
+
+    不超过2个样本的数据块直接返回原始样本，避免重复输出同一样本。
+    """
+    if len(timestamps) <= 2:
+        return timestamps, values
+    lo = values.argmin(axis=0)
+    hi = values.argmax(axis=0)
+    columns = np.arange(values.shape[1])
+    first = np.where(lo <= hi, lo, hi)
+    second = np.where(lo <= hi, hi, lo)
+    points = np.stack([values[first, columns], values[second, columns]])
+    return np.array([timestamps[0], timestamps[-1]]), points
+
+
+def _lttb_bucket(timestamps, values, prev_t, prev_values, next_t, next_values):
+    """LTTB：在数据块中为每个通道选出与前一选中点、下一块均值构成最大三角形的点"""
+    area = np.abs((prev_t - next_t) * (values - prev_values)
+                  - (prev_t - timestamps[:, None]) * (next_values - prev_values))
+    index = area.argmax(axis=0)
+    return values[index, np.arange(values.shape[1])]
+
+
+def minmax_envelope(timestamps, values, n_buckets):
+    """min/max包络抽取：(N,)时间戳和(N, C)数据 -> 2*n_buckets个点"""
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values)
+    if len(timestamps) <= 2 * n_buckets:
+        return timestamps, values
+    edges = _bucket_edges(len(timestamps), n_buckets)
+    out_t = np.empty(2 * n_buckets)
+    out_v = np.empty((2 * n_buckets, values.shape[1]), dtype=values.dtype)
+    for b in range(n_buckets):
+        start, stop = edges[b], edges[b + 1]
+        out_t[2 * b:2 * b + 2], out_v[2 * b:2 * b + 2] = _minmax_bucket(
+            timestamps[start:stop], values[start:stop])
+    return out_t, out_v
+
+
+def lttb(timestamps, values, n_out):
+    """Largest-Triangle-Three-Buckets抽取：(N, C)数据 -> n_out个点
+
+    每个通道独立选点，返回的时间戳为各数据块的中心时间，数值为(n_out, C)。
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    values = np.asarray(values)
+    n = len(timestamps)
+    if n <= n_out or n_out < 3:
+        return timestamps, values
+
+    edges = np.concatenate([[0], _bucket_edges(n - 2, n_out - 2) + 1, [n]])
+    out_t = np.empty(n_out)
+    out_v = np.empty((n_out, values.shape[1]), dtype=values.dtype)
+    out_t[0], out_v[0] = timestamps[0], values[0]
+    out_t[-1], out_v[-1] = timestamps[-1], values[-1]
+    prev_values = values[0].astype(np.float64)
+    prev_t = timestamps[0]
+    for b in range(1, n_out - 1):
+        start, stop = edges[b], edges[b + 1]
+        next_start, next_stop = edges[b + 1], edges[b + 2]
+        next_t = timestamps[next_start:next_stop].mean()
+        next_values = values[next_start:next_stop].mean(axis=0)
+        selected = _lttb_bucket(timestamps[start:stop], values[start:stop].astype(np.float64),
+                                prev_t, prev_values, next_t, next_values)
+        out_t[b] = timestamps[start:stop].mean()
+        out_v[b] = selected
+        prev_t, prev_values = out_t[b], selected
+    return out_t, out_v
+
+
+class StreamingDecimator:
+    """实时可视化的逐客户端EMG抽取
+
+    按显示宽度pixels和时间窗口window（秒）把时间轴划分为固定时长的数据块
+    （window / pixels），每个完整的数据块输出固定数量的点：
+      minmax: 每块2个点（最小值和最大值，按出现先后）
+      lttb:   每块1个点（LTTB选点，比minmax延迟一个数据块）
+    因此无论窗口多长，浏览器始终只需绘制约points_per_window个点。
+    数据块至少包含每块输出点数个采样周期（按sampling_rate计算），
+    输出点数不会超过原始EMG样本数。
+    原始EMG和滤波EMG作为不同通道一起抽取。
+    """
+
+    def __init__(self, pixels=800, window=10.0, mode='minmax', sampling_rate=200):
+        if mode not in DECIMATION_MODES:
+            raise ValueError(f"不支持的抽取方式: {mode}")
+        if pixels <= 0 or window <= 0 or sampling_rate <= 0:
+            raise ValueError("pixels、window和sampling_rate必须为正数")
+        self.pixels = int(pixels)
+        self.window = float(window)
+        self.mode = mode
+        self.points_per_bucket = 2 if mode == 'minmax' else 1
+        self.bucket_duration = max(self.window / self.pixels, self.points_per_bucket / sampling_rate)
+        self.bucket_start = None
+        self.pending_t = []
+        self.pending_v = []
+        # LTTB需要前一个选中点和一个已完成但尚未输出的数据块
+        self.prev_t = None
+        self.prev_values = None
+        self.held_bucket = None
+
+    @property
+    def points_per_window(self):
+        return int(round(self.window / self.bucket_duration)) * self.points_per_bucket
+
+    def feed(self, samples):
+        """输入[(timestamp, raw, filtered), ...]，返回已完成数据块的抽取结果（同样格式）"""
+        if not samples:
+            return []
+        timestamps = np.array([sample[0] for sample in samples], dtype=np.float64)
+        num_channels = len(samples[0][1])
+        values = np.hstack([np.array([sample[1] for sample in samples], dtype=np.float64),
+                            np.array([sample[2] for sample in samples], dtype=np.float64)])
+        if self.bucket_start is None:
+            self.bucket_start = timestamps[0]
+
+        self.pending_t.append(timestamps)
+        self.pending_v.append(values)
+        timestamps = np.concatenate(self.pending_t)
+        values = np.vstack(self.pending_v)
+
+        # 最后一个样本所在的数据块尚未完成，留到下次
+        bucket_ids = np.floor((timestamps - self.bucket_start) / self.bucket_duration).astype(np.int64)
+        last_bucket = bucket_ids[-1]
+        complete = bucket_ids < last_bucket
+        boundaries = np.flatnonzero(np.diff(bucket_ids[complete])) + 1
+        starts = np.concatenate([[0], boundaries]) if complete.any() else np.zeros(0, dtype=np.int64)
+        stops = np.concatenate([boundaries, [complete.sum()]]) if complete.any() else starts
+
+        out_t, out_v = [], []
+        for start, stop in zip(starts, stops):
+            bucket_t, bucket_v = timestamps[start:stop], values[start:stop]
+            if self.mode == 'minmax':
+                t, v = _minmax_bucket(bucket_t, bucket_v)
+                out_t.append(t)
+                out_v.append(v)
+            else:
+                point = self._lttb_push(bucket_t, bucket_v)
+                if point is not None:
+                    out_t.append(point[0])
+                    out_v.append(point[1])
+
+        self.pending_t = [timestamps[~complete]]
+        self.pending_v = [values[~complete]]
+        self.bucket_start += last_bucket * self.bucket_duration
+
+        if not out_t:
+            return []
+        out_t = np.concatenate(out_t)
+        out_v = np.vstack(out_v)
+        raw = np.rint(out_v[:, :num_channels]).astype(np.int64)
+        filtered = out_v[:, num_channels:]
+        return [(t, r, f) for t, r, f in zip(out_t.tolist(), raw.tolist(), filtered.tolist())]
+
+    def _lttb_push(self, bucket_t, bucket_v):
+        """放入一个完成的数据块，输出上一个数据块的选点"""
+        if self.held_bucket is None:
+            # 第一个数据块：以其第一个样本作为初始的前一选中点
+            self.held_bucket = (bucket_t, bucket_v)
+            self.prev_t, self.prev_values = bucket_t[0], bucket_v[0]
+            return None
+        held_t, held_v = self.held_bucket
+        selected = _lttb_bucket(held_t, held_v, self.prev_t, self.prev_values,
+                                bucket_t.mean(), bucket_v.mean(axis=0))
+        self.held_bucket = (bucket_t, bucket_v)
+        self.prev_t, self.prev_values = held_t.mean(), selected
+        return np.array([self.prev_t]), selected[None, :]
@@ -0,0 +1,218 @@
+import h5py
+import numpy as np
+
+from data_processing.onset_detection import trial_active_range
+from data_storage.schema import schema_paths
+
+# 默认频带功率的频带(Hz)，避开50Hz陷波
+DEFAULT_BANDS = [(20, 45), (55, 95)]
+
+def feature_names(bands=DEFAULT_BANDS):
+    """特征顺序：时域特征 + 各频带功率"""
+    return ['rms', 'mav', 'wl', 'zc', 'ssc'] + [f'bp_{low:g}_{high:g}' for low, high in bands]
+
+
+def _band_bins(window, sampling_rate, bands):
+    """各频带包含的DFT频点（单边）"""
+    freqs = np.arange(window // 2 + 1) * sampling_rate / window
+    return [np.flatnonzero((freqs >= low) & (freqs <= high)) for low, high in bands]
+
+
+def _bin_weights(window):
+    """单边功率谱的权重：直流和奈奎斯特频点不加倍"""
+    weights = np.full(window // 2 + 1, 2.0)
+    weights[0] = 1.0
+    if window % 2 == 0:
+        weights[-1] = 1.0
+    return weights / window ** 2
+
+
+def _zc_contribution(x, prev, threshold):
+    return ((x * prev < 0) & (np.abs(x - prev) >= threshold)).astype(np.float64)
+
+
+def _ssc_contribution(x, prev, prev2, threshold):
+    # 斜率符号变化记在中间样本prev上，在其后一个样本到达时计入
+    slope = (prev - prev2) * (prev - x)
+    return ((slope > 0) & (slope >= threshold)).astype(np.float64)
+
+
+class EMGFeatureExtractor:
+    """滑动窗口EMG特征的增量计算
+
+    对window个样本的滑动窗口，每隔hop个样本输出一次全部通道的特征：
+    RMS、MAV、波形长度WL、过零次数ZC、斜率符号变化SSC和各频带功率。
+    时域特征由逐样本贡献的环形缓冲区和累加和维护，频带功率由滑动DFT维护，
+    每个新样本对所有通道的更新都是O(1)。为抑制浮点累积误差，
+    每resync_windows个窗口从环形缓冲区精确重算一次累加值。
+    特征的定义与extract_features（批量模式）一致。
+    """
+
+    def __init__(self, window=50, hop=10, sampling_rate=200, num_channels=8, bands=DEFAULT_BANDS,
+                 zc_threshold=0.0, ssc_threshold=0.0, resync_windows=20):
+        self.window = window
+        self.hop = hop
+        self.sampling_rate = sampling_rate
+        self.num_channels = num_channels
+        self.bands = [tuple(band) for band in bands]
+        self.names = feature_names(self.bands)
+        self.zc_threshold = zc_threshold
+        self.ssc_threshold = ssc_threshold
+        self.resync_interval = resync_windows * window
+
+        band_bins = _band_bins(window, sampling_rate, self.bands)
+        self.bins = np.unique(np.concatenate(band_bins)) if band_bins else np.zeros(0, dtype=np.int64)
+        self.band_index = [np.searchsorted(self.bins, b) for b in band_bins]
+        self.bin_weights = _bin_weights(window)[self.bins][:, None]
+        self.twiddle = np.exp(2j * np.pi * self.bins / window)[:, None]
+        self.reset()
+
+    def reset(self):
+        shape = (self.window, self.num_channels)
+        self.samples = np.zeros(shape)
+        # 每个样本对WL、ZC、SSC的贡献
+        self.wl_terms = np.zeros(shape)
+        self.zc_terms = np.zeros(shape)
+        self.ssc_terms = np.zeros(shape)
+        self.sum_sq = np.zeros(self.num_channels)
+        self.sum_abs = np.zeros(self.num_channels)
+        self.sum_wl = np.zeros(self.num_channels)
+        self.sum_zc = np.zeros(self.num_channels)
+        self.sum_ssc = np.zeros(self.num_channels)
+        self.dft = np.zeros((len(self.bins), self.num_channels), dtype=np.complex128)
+        self.prev = None
+        self.prev2 = None
+        self.position = 0
+        self.count = 0
+
+    def update(self, samples, timestamps=None):
+        """输入一块滤波后的样本(n, C)，返回本块内到达的特征帧[(时间戳, (F, C)特征)]"""
+        samples = np.asarray(samples, dtype=np.float64).reshape(-1, self.num_channels)
+        outputs = []
+        for i, x in enumerate(samples):
+            self._push(x)
+            if self.count >= self.window and (self.count - self.window) % self.hop == 0:
+                timestamp = timestamps[i] if timestamps is not None else self.count
+                outputs.append((timestamp, self.current()))
+        return outputs
+
+    def _push(self, x):
+        p = self.position
+        old = self.samples[p]
+        prev = self.prev if self.prev is not None else x
+        prev2 = self.prev2 if self.prev2 is not None else prev
+
+        # 新样本的贡献（第一个样本与自身比较，贡献为0）
+        wl = np.abs(x - prev)
+        zc = _zc_contribution(x, prev, self.zc_threshold)
+        ssc = _ssc_contribution(x, prev, prev2, self.ssc_threshold)
+
+        self.sum_sq += x * x - old * old
+        self.sum_abs += np.abs(x) - np.abs(old)
+        self.sum_wl += wl - self.wl_terms[p]
+        self.sum_zc += zc - self.zc_terms[p]
+        self.sum_ssc += ssc - self.ssc_terms[p]
+        # 滑动DFT：X_k <- (X_k - x_old + x_new) * e^(j2πk/W)
+        self.dft = (self.dft + (x - old)) * self.twiddle
+
+        self.samples[p] = x
+        self.wl_terms[p] = wl
+        self.zc_terms[p] = zc
+        self.ssc_terms[p] = ssc
+        self.position = (p + 1) % self.window
+        self.prev2, self.prev = prev, x
+        self.count += 1
+        if self.count % self.resync_interval == 0:
+            self._resync()
+
+    def _resync(self):
+        """从环形缓冲区精确重算累加值"""
+        self.sum_sq = (self.samples ** 2).sum(axis=0)
+        self.sum_abs = np.abs(self.samples).sum(axis=0)
+        self.sum_wl = self.wl_terms.sum(axis=0)
+        self.sum_zc = self.zc_terms.sum(axis=0)
+        self.sum_ssc = self.ssc_terms.sum(axis=0)
+        # 按时间顺序排列的窗口，最旧的样本在position处
+        ordered = np.roll(self.samples, -self.position, axis=0)
+        n = np.arange(self.window)
+        self.dft = np.exp(-2j * np.pi * np.outer(self.bins, n) / self.window) @ ordered
+
+    def current(self):
+        """当前窗口的特征，(F, C) float32"""
+        n = min(self.count, self.window) or 1
+        power = np.abs(self.dft) ** 2 * self.bin_weights
+        rows = [
+            np.sqrt(np.maximum(self.sum_sq, 0) / n),
+            self.sum_abs / n,
+            self.sum_wl,
+            self.sum_zc,
+            self.sum_ssc
+        ] + [power[index].sum(axis=0) for index in self.band_index]
+        return np.array(rows, dtype=np.float32)
+
+
+def extract_features(emg, window=50, hop=10, sampling_rate=200, bands=DEFAULT_BANDS,
+                     zc_threshold=0.0, ssc_threshold=0.0):
+    """批量模式：对整段(N, C)滤波EMG计算所有窗口的特征
+
+    返回(窗口结束样本下标(M,), 特征(M, F, C) float32)，窗口与EMGFeatureExtractor的输出一一对应。
+    """
+    x = np.asarray(emg, dtype=np.float64)
+    n, num_channels = x.shape
+    if n < window:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, len(feature_names(bands)), num_channels),
+                                                     dtype=np.float32)
+    ends = np.arange(window - 1, n, hop)
+    starts = ends - window + 1
+
+    prev = np.vstack([x[:1], x[:-1]])
+    prev2 = np.vstack([prev[:1], prev[:-1]])
+    terms = {
+        'sq': x * x,
+        'abs': np.abs(x),
+        'wl': np.abs(x - prev),
+        'zc': _zc_contribution(x, prev, zc_threshold),
+        'ssc': _ssc_contribution(x, prev, prev2, ssc_threshold)
+    }
+    sums = {}
+    for key, value in terms.items():
+        cumulative = np.vstack([np.zeros((1, num_channels)), np.cumsum(value, axis=0)])
+        sums[key] = cumulative[ends + 1] - cumulative[starts]
+
+    windows = np.lib.stride_tricks.sliding_window_view(x, window, axis=0)[starts]
+    spectrum = np.fft.rfft(windows, axis=-1)
+    power = np.abs(spectrum) ** 2 * _bin_weights(window)
+    band_power = [power[:, :, bins].sum(axis=-1) for bins in _band_bins(window, sampling_rate, bands)]
+
+    features = np.stack([
+        np.sqrt(sums['sq'] / window),
+        sums['abs'] / window,
+        sums['wl'],
+        sums['zc'],
+        sums['ssc']
+    ] + band_power, axis=1)
+    return ends, features.astype(np.float32)
+
+
+def extract_file_features(path, dataset=None, window=50, hop=10, sampling_rate=200, bands=DEFAULT_BANDS,
+                          zc_threshold=0.0, ssc_threshold=0.0, active_only=False):
+    """批量模式：读取试验文件中存储的滤波EMG并计算特征
+
+    dataset为空时使用记录时的在线滤波结果，也可指定离线滤波结果（如emg/processed/zero_phase）。
+    active_only=True时只读取自动裁剪标记的激活时间范围（没有标记时读取全部）。
+    返回(窗口结束时间戳(M,), 特征(M, F, C), 特征名)。
+    """
+    with h5py.File(path, 'r') as f:
+        paths = schema_paths(f)
+        timestamps_path, filtered_path = paths['emg_timestamps'], paths['emg_filtered']
+        timestamps = f[timestamps_path][:]
+        active = trial_active_range(f) if active_only else None
+        if active is not None:
+            # 时间戳单调递增，只读取范围内的行
+            start, stop = np.searchsorted(timestamps, active[0]), np.searchsorted(timestamps, active[1], 'right')
+            timestamps = timestamps[start:stop]
+            emg = f[dataset or filtered_path][start:stop]
+        else:
+            emg = f[dataset or filtered_path][:]
+    ends, features = extract_features(emg, window, hop, sampling_rate, bands, zc_threshold, ssc_threshold)
+    return timestamps[ends], features, feature_names(bands)
@@ -1,49 +1,184 @@
+import json
+from functools import lru_cache
+
 import numpy as np
 from scipy import signal
-from collections import deque
+
+# 默认滤波链：20-95Hz带通 + 50Hz陷波
+DEFAULT_FILTER_CHAIN = [
+    {'type': 'bandpass', 'low': 20, 'high': 95, 'order': 2},
+    {'type': 'notch', 'freq': 50, 'q': 30}
+]
+
+# 滤波器输出形式：filtered为滤波结果，rectified为滤波后全波整流
+FILTER_OUTPUTS = ('filtered', 'rectified')
+
+# 默认滤波管线：与记录文件元数据中的filter_pipeline格式相同
+DEFAULT_FILTER_PIPELINE = {
+    'sampling_rate': 200,
+    'stages': DEFAULT_FILTER_CHAIN,
+    'output': 'filtered'
+}
+
+# 各滤波器类型的必填参数和默认参数
+_STAGE_PARAMS = {
+    'bandpass': (('low', 'high'), {'order': 2}),
+    'highpass': (('cutoff',), {'order': 2}),
+    'lowpass': (('cutoff',), {'order': 2}),
+    'notch': (('freq',), {'q': 30.0, 'harmonics': 1})
+}
+
+
+def normalize_filter_pipeline(pipeline=None):
+    """校验滤波管线描述并补全默认参数，返回规范化后的新字典
+
+    pipeline: {'sampling_rate': Hz, 'stages': [...], 'output': 'filtered'|'rectified'}，
+    stages中每一级为{'type': ..., 参数}，notch可用harmonics同时滤除前n次谐波。
+    描述无效时抛出ValueError。
+    """
+    pipeline = dict(DEFAULT_FILTER_PIPELINE, **(pipeline or {}))
+    sampling_rate = float(pipeline['sampling_rate'])
+    if sampling_rate <= 0:
+        raise ValueError("采样率必须为正数")
+    nyquist = sampling_rate / 2
+    if pipeline['output'] not in FILTER_OUTPUTS:
+        raise ValueError(f"不支持的输出形式: {pipeline['output']}")
+
+    if not pipeline['stages']:
+        raise ValueError("滤波管线至少需要一级滤波器")
+    stages = []
+    for stage in pipeline['stages']:
+        kind = stage.get('type')
+        if kind not in _STAGE_PARAMS:
+            raise ValueError(f"不支持的滤波器类型: {kind}")
+        required, defaults = _STAGE_PARAMS[kind]
+        missing = [name for name in required if name not in stage]
+        if missing:
+            raise ValueError(f"{kind}缺少参数: {', '.join(missing)}")
+        unknown = set(stage) - set(required) - set(defaults) - {'type'}
+        if unknown:
+            raise ValueError(f"{kind}不支持的参数: {', '.join(sorted(unknown))}")
+        normalized = {'type': kind}
+        for name in required:
+            normalized[name] = float(stage[name])
+        for name, default in defaults.items():
+            normalized[name] = type(default)(stage.get(name, default))
+
+        frequencies = [normalized[name] for name in required]
+        if not all(0 < freq < nyquist for freq in frequencies):
+            raise ValueError(f"{kind}的频率必须在0到{nyquist:g}Hz之间")
+        if kind == 'bandpass' and normalized['low'] >= normalized['high']:
+            raise ValueError("bandpass的low必须小于high")
+        if normalized.get('order', 1) < 1 or normalized.get('harmonics', 1) < 1 or normalized.get('q', 1) <= 0:
+            raise ValueError(f"{kind}的阶数、谐波数和品质因数必须为正数")
+        stages.append(normalized)
+
+    return {'sampling_rate': sampling_rate, 'stages': stages, 'output': pipeline['output']}
+
+
+def filter_pipeline_key(pipeline):
+    """滤波管线的规范JSON表示，用作缓存键和写入试验元数据"""
+    return json.dumps(normalize_filter_pipeline(pipeline), sort_keys=True)
+
+
+@lru_cache(maxsize=32)
+def _design_cached(chain_key, sampling_rate):
+    sections = []
+    nyquist = sampling_rate / 2
+    for stage in json.loads(chain_key):
+        kind = stage['type']
+        if kind == 'bandpass':
+            sections.append(signal.butter(stage['order'], [stage['low'], stage['high']], btype='band',
+                                          fs=sampling_rate, output='sos'))
+        elif kind in ('highpass', 'lowpass'):
+            sections.append(signal.butter(stage['order'], stage['cutoff'], btype=kind, fs=sampling_rate, output='sos'))
+        elif kind == 'notch':
+            # 基频及其谐波（不超过奈奎斯特频率）
+            for k in range(1, stage['harmonics'] + 1):
+                freq = stage['freq'] * k
+                if freq >= nyquist:
+                    break
+                b, a = signal.iirnotch(freq, stage['q'], fs=sampling_rate)
+                sections.append(signal.tf2sos(b, a))
+    return np.vstack(sections)
+
+
+def design_filter_chain(chain, sampling_rate):
+    """把滤波链描述设计为一个SOS级联，返回(n_sections, 6)数组
+
+    支持的类型：bandpass(low, high)、highpass(cutoff)、lowpass(cutoff)（Butterworth，order默认2），
+    以及notch(freq, q, harmonics)。相同参数的设计结果会被缓存，返回的是缓存的副本。
+    """
+    stages = normalize_filter_pipeline({'sampling_rate': sampling_rate, 'stages': chain})['stages']
+    return _design_cached(json.dumps(stages, sort_keys=True), float(sampling_rate)).copy()
+
+
+def apply_filter_pipeline(raw, pipeline=None, zero_phase=False):
+    """离线对整段(N, C)原始EMG应用滤波管线
+
+    zero_phase=False时与EMGFilter从零状态开始的在线输出逐位相同；
+    zero_phase=True时前向+反向滤波，没有相位延迟。
+    """
+    pipeline = normalize_filter_pipeline(pipeline)
+    sos = design_filter_chain(pipeline['stages'], pipeline['sampling_rate'])
+    raw = np.asarray(raw, dtype=np.float64)
+    if zero_phase:
+        filtered = signal.sosfiltfilt(sos, raw, axis=0)
+    else:
+        filtered = signal.sosfilt(sos, raw, axis=0)
+    return np.abs(filtered) if pipeline['output'] == 'rectified' else filtered
 
 
 class EMGFilter:
-    def __init__(self, sampling_rate=200):
-        self.sampling_rate = sampling_rate
-        
-        # 初始化缓冲区
-        self.buffer_size = 50
-        self.emg_buffers = [deque(maxlen=self.buffer_size) for _ in range(8)]
-        
-        # 设计滤波器
-        nyquist_freq = sampling_rate / 2
-        self.b_bandpass, self.a_bandpass = signal.butter(2, 
-            [20/nyquist_freq, 95/nyquist_freq], 
-            btype='band')
-        self.b_notch, self.a_notch = signal.iirnotch(
-            50/nyquist_freq, 30, sampling_rate)
-            
+    """流式EMG滤波器（默认20-95Hz带通 + 50Hz陷波，可由滤波管线描述配置）
+
+    滤波器以二阶节(SOS)形式设计，每个通道保存各节的延迟状态zi，
+    每个新样本只做一次增量计算，不再对历史缓冲区重复滤波。
+    从零初始状态开始，逐样本（或逐块）输出与对整段连续信号一次性
+    sosfilt的结果逐位相同，没有重复滤波带来的启动瞬态。
+    (n, C)数据块沿样本轴一次调用完成所有通道的滤波。
+    """
+
+    def __init__(self, sampling_rate=200, num_channels=8, chain=DEFAULT_FILTER_CHAIN, output='filtered'):
+        self.pipeline = normalize_filter_pipeline(
+            {'sampling_rate': sampling_rate, 'stages': chain, 'output': output})
+        self.sampling_rate = self.pipeline['sampling_rate']
+        self.num_channels = num_channels
+        self.rectify = output == 'rectified'
+
+        # 设计滤波器（相同参数只设计一次）
+        self.sos = design_filter_chain(self.pipeline['stages'], self.sampling_rate)
+
+        # 每个二阶节、每个通道的滤波器状态
+        self.zi = np.zeros((self.sos.shape[0], 2, num_channels))
+        self.last_output = np.zeros(num_channels)
+
+    @classmethod
+    def from_pipeline(cls, pipeline=None, num_channels=8):
+        """由滤波管线描述创建滤波器"""
+        pipeline = normalize_filter_pipeline(pipeline)
+        return cls(pipeline['sampling_rate'], num_channels, pipeline['stages'], pipeline['output'])
+
+    def reset(self):
+        """清空滤波器状态（如设备重连后重新开始）"""
+        self.zi[:] = 0
+        self.last_output = np.zeros(self.num_channels)
+
+    def process(self, samples):
+        """增量滤波一个样本(C,)或一块样本(n, C)，返回相同形状的滤波结果"""
+        samples = np.asarray(samples, dtype=np.float64)
+        block = samples.reshape(-1, self.num_channels)
+        filtered, self.zi = signal.sosfilt(self.sos, block, axis=0, zi=self.zi)
+        if self.rectify:
+            filtered = np.abs(filtered)
+        if len(filtered):
+            self.last_output = filtered[-1]
+        return filtered.reshape(samples.shape)
+
     def update_buffer(self, emg_data):
-        """更新数据缓冲区"""
-        for i, value in enumerate(emg_data):
-            self.emg_buffers[i].append(value)
-            
+        """输入一个新样本并更新滤波状态"""
+        self.process(emg_data)
+
     def filter_data(self):
-        """应用滤波器处理数据"""
-        filtered_data = np.zeros(8)
-        
-        for i in range(8):
-            if len(self.emg_buffers[i]) >= 10:  # 确保有足够的数据点
-                data = np.array(list(self.emg_buffers[i]))
-                
-                try:
-                    # 应用带通滤波
-                    filtered = signal.lfilter(self.b_bandpass, self.a_bandpass, data)
-                    # 应用陷波滤波
-                    filtered = signal.lfilter(self.b_notch, self.a_notch, filtered)
-                    # 获取最新的滤波结果
-                    filtered_data[i] = filtered[-1]
-                except Exception as e:
-                    print(f"滤波错误: {e}")
-                    filtered_data[i] = data[-1]  # 出错时使用原始数据
-            else:
-                # 数据不足时使用原始数据
-                filtered_data[i] = self.emg_buffers[i][-1] if self.emg_buffers[i] else 0
-                
-        return filtered_data
\ No newline at end of file
+        """最新样本的滤波结果"""
+        return self.last_output.copy()
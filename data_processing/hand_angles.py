@@ -2,6 +2,171 @@ import cv2
 import numpy as np
 
 
+# 关节角度的固定顺序（与calculate_joint_angles的计算顺序一致）
+FINGER_NAMES = ['thumb', 'index', 'middle', 'ring', 'pinky']
+JOINT_NAMES = [
+    f'{finger}_{joint}'
+    for finger in FINGER_NAMES
+    for joint in ['mcp_flexion', 'mcp_abduction', 'pip_flexion', 'dip_flexion']
+]
+
+# 各手指的关节链（关键点索引，掌根 -> 指尖），按FINGER_NAMES顺序
+FINGER_CHAINS = np.array([
+    [0, 1, 2, 3, 4],
+    [0, 5, 6, 7, 8],
+    [0, 9, 10, 11, 12],
+    [0, 13, 14, 15, 16],
+    [0, 17, 18, 19, 20]
+])
+MIDDLE_FINGER = FINGER_NAMES.index('middle')
+
+# 各关节角度的限制范围（度），按JOINT_NAMES顺序
+JOINT_LIMITS = np.array([
+    [0, 50], [0, 70], [0, 80], [0, 90]          # 拇指
+] + [
+    [0, 90], [-20, 20], [0, 100], [0, 90]       # 其他手指
+] * 4, dtype=np.float64)
+
+
+def landmark_array(hand_landmarks):
+    """MediaPipe关键点或(21, 3)数组 -> float64的(21, 3)数组"""
+    if hasattr(hand_landmarks, 'landmark'):
+        return np.array([[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark])
+    return np.asarray(hand_landmarks, dtype=np.float64)
+
+
+def _dot(a, b):
+    # 批量matmul与逐个np.dot的累加方式相同，结果逐位一致
+    return (a[..., None, :] @ b[..., :, None])[..., 0, 0]
+
+
+def _norm(v):
+    return np.sqrt(_dot(v, v))
+
+
+def _angle_deg(cos_angle):
+    return np.degrees(np.arccos(np.clip(cos_angle, -1.0, 1.0)))
+
+
+def hand_coordinate_systems(points):
+    """手部解剖坐标系：(..., 21, 3)关键点 -> 原点(..., 3)和旋转矩阵(..., 3, 3)（列为x、y、z轴）"""
+    points = np.asarray(points, dtype=np.float64)
+    origin = points[..., 0, :]
+    # Z轴：手掌法向量；Y轴：指向中指MCP并与Z轴正交；X轴：右手定则
+    z_axis = np.cross(points[..., 5, :] - origin, points[..., 17, :] - origin)
+    z_axis = z_axis / _norm(z_axis)[..., None]
+    y_axis = points[..., 9, :] - origin
+    y_axis = y_axis - _dot(y_axis, z_axis)[..., None] * z_axis
+    y_axis = y_axis / _norm(y_axis)[..., None]
+    x_axis = np.cross(y_axis, z_axis)
+    x_axis = x_axis / _norm(x_axis)[..., None]
+    return origin, np.stack([x_axis, y_axis, z_axis], axis=-1)
+
+
+def compute_joint_angles(points):
+    """批量计算未经限幅和平滑的关节角度
+
+    points为一帧(21, 3)或N帧(N, 21, 3)关键点，返回(20,)或(N, 20)角度（度），按JOINT_NAMES顺序。
+    所有手指、所有关节同时计算，结果与HandAngleCalculator逐关节计算的原始角度相同。
+    """
+    points = np.asarray(points, dtype=np.float64)
+    _, rotation = hand_coordinate_systems(points)
+    chains = points[..., FINGER_CHAINS, :]               # (..., 5, 5, 3)
+
+    # 屈曲角：相邻两段骨骼向量的夹角（MCP、PIP、DIP）
+    segments = chains[..., 1:, :] - chains[..., :-1, :]  # (..., 5, 4, 3)
+    first, second = segments[..., :-1, :], segments[..., 1:, :]
+    flexion = _angle_deg(_dot(first, second) / (_norm(first) * _norm(second)))  # (..., 5, 3)
+
+    # 外展角：掌根到MCP的方向在手掌XY平面内与Y轴的夹角，x分量为负时取负
+    base = segments[..., 0, :]
+    base = base / _norm(base)[..., None]
+    # 转置矩阵需连续存储，与逐个np.dot(rotation.T, v)的计算方式一致
+    rotation_t = np.ascontiguousarray(np.swapaxes(rotation, -1, -2))
+    local = (rotation_t[..., None, :, :] @ base[..., :, None])[..., 0]
+    projection = local.copy()
+    projection[..., 2] = 0
+    projection_norm = _norm(projection)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        projection = projection / projection_norm[..., None]
+    abduction = _angle_deg(projection[..., 1])
+    abduction = np.where(projection[..., 0] < 0, -abduction, abduction)
+    # 投影太小说明手指竖直，外展角取0
+    abduction = np.where(projection_norm < 0.1, 0.0, abduction)
+
+    # 中指：相对食指与无名指MCP中点方向的夹角，方向由手掌法向量判断
+    palm = points[..., 0, :]
+    mid_vector = (points[..., 5, :] + points[..., 13, :]) / 2 - palm
+    mid_vector = mid_vector / _norm(mid_vector)[..., None]
+    middle_vector = points[..., 9, :] - palm
+    middle_vector = middle_vector / _norm(middle_vector)[..., None]
+    middle = _angle_deg(_dot(middle_vector, mid_vector))
+    direction = np.sign(_dot(np.cross(mid_vector, middle_vector), rotation[..., :, 2]))
+    abduction[..., MIDDLE_FINGER] = direction * middle
+
+    angles = np.stack([flexion[..., 0], abduction, flexion[..., 1], flexion[..., 2]], axis=-1)
+    return angles.reshape(angles.shape[:-2] + (len(JOINT_NAMES),))
+
+
+class AngleSmoother:
+    """全部关节共用的角度平滑状态：加权移动平均 + 一维卡尔曼滤波
+
+    历史窗口、卡尔曼状态和协方差都是按关节排列的定长数组，
+    各历史长度的指数权重预先计算，每帧对所有关节做一次向量化更新。
+    在线时逐帧调用update；离线时process可直接处理(N, 关节数)数组，结果与逐帧在线处理相同。
+    """
+
+    def __init__(self, num_joints=len(JOINT_NAMES), history_length=5, process_noise=0.1,
+                 measurement_noise=1.0, initial_covariance=1.0, decimals=2):
+        self.num_joints = num_joints
+        self.history_length = history_length
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.initial_covariance = initial_covariance
+        self.decimals = decimals
+
+        # weights[k - 1]为历史长度k时的权重（旧 -> 新），与np.average一样再除以权重和
+        self.weights = []
+        for k in range(1, history_length + 1):
+            weights = np.exp(np.linspace(-1, 0, k))
+            weights /= weights.sum()
+            self.weights.append((weights[:, None], weights.sum()))
+        self.reset()
+
+    def reset(self):
+        # 历史窗口按时间顺序排列，最新的在最后一行
+        self.history = np.zeros((self.history_length, self.num_joints))
+        self.count = 0
+        self.initialized = False
+        self.x = np.zeros(self.num_joints)                           # 状态估计
+        self.P = np.full(self.num_joints, self.initial_covariance)   # 估计误差协方差
+
+    def update(self, values):
+        """输入一帧(关节数,)角度，返回平滑和滤波后的角度"""
+        self.history[:-1] = self.history[1:]
+        self.history[-1] = values
+        self.count = min(self.count + 1, self.history_length)
+
+        # 加权移动平均
+        weights, scale = self.weights[self.count - 1]
+        smoothed = (self.history[-self.count:] * weights).sum(axis=0) / scale
+
+        # 卡尔曼滤波：第一帧以平滑值初始化状态
+        if not self.initialized:
+            self.x = smoothed.copy()
+            self.initialized = True
+        P_pred = self.P + self.process_noise
+        K = P_pred / (P_pred + self.measurement_noise)
+        self.x = self.x + K * (smoothed - self.x)
+        self.P = (1 - K) * P_pred
+        return np.round(self.x, self.decimals)
+
+    def process(self, values):
+        """离线处理(N, 关节数)角度序列（从当前状态继续），返回相同形状的结果"""
+        values = np.asarray(values, dtype=np.float64)
+        return np.array([self.update(frame) for frame in values]).reshape(values.shape)
+
+
 class HandAngleCalculator:
     def __init__(self):
         # 定义手指关节链
@@ -13,92 +178,23 @@ class HandAngleCalculator:
             'pinky': [0, 17, 18, 19, 20]   # 小指: MCP(2DOF), PIP(1DOF), DIP(1DOF)
         }
 
-        self.angle_history = {}  # 存储历史角度数据
-        self.history_length = 5  # 历史数据长度
-        self.kalman_filters = {}  # 卡尔曼滤波器字典
-
-    def apply_kalman_filter(self, angle_name, value):
-        """应用卡尔曼滤波"""
-        if angle_name not in self.kalman_filters:
-            self.kalman_filters[angle_name] = {
-                'x': value,  # 状态估计
-                'P': 1.0,    # 估计误差协方差
-                'Q': 0.1,    # 过程噪声协方差
-                'R': 1.0     # 测量噪声协方差
-            }
-        
-        kf = self.kalman_filters[angle_name]
-        
-        # 预测
-        x_pred = kf['x']
-        P_pred = kf['P'] + kf['Q']
-        
-        # 更新
-        K = P_pred / (P_pred + kf['R'])  # 卡尔曼增益
-        kf['x'] = x_pred + K * (value - x_pred)
-        kf['P'] = (1 - K) * P_pred
-        
-        return kf['x']
+        # 所有关节的平滑和卡尔曼滤波状态
+        self.smoother = AngleSmoother(len(JOINT_NAMES))
 
-    def smooth_angle(self, angle_name, value):
-        """平滑角度数据"""
-        if angle_name not in self.angle_history:
-            self.angle_history[angle_name] = []
-            
-        history = self.angle_history[angle_name]
-        history.append(value)
-        
-        # 保持固定长度的历史数据
-        if len(history) > self.history_length:
-            history.pop(0)
-            
-        # 使用加权移动平均
-        weights = np.exp(np.linspace(-1, 0, len(history)))
-        weights /= weights.sum()
-        
-        smoothed = np.average(history, weights=weights)
-        
-        # 应用卡尔曼滤波
-        filtered = self.apply_kalman_filter(angle_name, smoothed)
-        
-        return round(filtered, 2)
-    
-    def process_angle(self, angle_name, value, min_val, max_val):
-        """处理角度数据：限制范围、平滑和滤波"""
-        # 首先限制角度范围
-        clipped = np.clip(value, min_val, max_val)
-        # 然后应用平滑和滤波
-        return self.smooth_angle(angle_name, clipped) 
+    def reset(self):
+        """清空平滑状态（如换手或重新检测到手部后）"""
+        self.smoother.reset()
+
+    def process_angles(self, raw_angles):
+        """处理一帧(20,)或N帧(N, 20)原始角度：限制范围、平滑和滤波"""
+        clipped = np.clip(raw_angles, JOINT_LIMITS[:, 0], JOINT_LIMITS[:, 1])
+        if clipped.ndim == 1:
+            return self.smoother.update(clipped)
+        return self.smoother.process(clipped)
                
     def create_hand_coordinate_system(self, landmarks):
-        """创建手部解剖坐标系"""
-        # 转换landmarks为numpy数组
-        points = np.array([[lm.x, lm.y, lm.z] for lm in landmarks.landmark])
-        
-        # 手掌中心（原点）
-        origin = points[0]
-        
-        # 建立手部坐标系
-        # Z轴：垂直于手掌平面（手掌法向量）
-        palm_normal = np.cross(
-            points[5] - points[0],    # 食指MCP到手掌中心的向量
-            points[17] - points[0]    # 小指MCP到手掌中心的向量
-        )
-        z_axis = palm_normal / np.linalg.norm(palm_normal)
-        
-        # Y轴：从手掌中心指向中指MCP
-        y_temp = points[9] - points[0]  # 中指MCP方向
-        y_axis = y_temp - np.dot(y_temp, z_axis) * z_axis
-        y_axis = y_axis / np.linalg.norm(y_axis)
-        
-        # X轴：右手定则，垂直于Y和Z
-        x_axis = np.cross(y_axis, z_axis)
-        x_axis = x_axis / np.linalg.norm(x_axis)
-        
-        # 创建旋转矩阵
-        rotation_matrix = np.vstack([x_axis, y_axis, z_axis]).T
-        
-        return origin, rotation_matrix
+        """创建手部解剖坐标系，landmarks为MediaPipe关键点或(21, 3)数组"""
+        return hand_coordinate_systems(landmark_array(landmarks))
     
     def transform_to_local(self, point, origin, rotation_matrix):
         """将点转换到局部坐标系"""
@@ -131,107 +227,23 @@ class HandAngleCalculator:
             return 0
         
     def calculate_joint_angles(self, hand_landmarks):
-        """计算所有关节角度"""
+        """计算所有关节角度，hand_landmarks为MediaPipe关键点或(21, 3)数组"""
         angles = {}
         try:
-            points = np.array([[lm.x, lm.y, lm.z] for lm in hand_landmarks.landmark])
-            origin, rotation_matrix = self.create_hand_coordinate_system(hand_landmarks)
+            raw_angles = compute_joint_angles(landmark_array(hand_landmarks))
+            angles = dict(zip(JOINT_NAMES, self.process_angles(raw_angles).tolist()))
             
-            # 计算每个手指的角度
-            for finger, chain in self.finger_chains.items():
-                # 计算基础角度
-                flexion = self.calculate_flexion_angle(
-                    hand_landmarks.landmark[chain[0]],
-                    hand_landmarks.landmark[chain[1]],
-                    hand_landmarks.landmark[chain[2]]
-                )
-                
-                # 计算外展角度
-                if finger == 'middle':
-                    # 特殊处理中指外展角度
-                    index_mcp = points[5]
-                    middle_mcp = points[9]
-                    ring_mcp = points[13]
-                    palm_center = points[0]
-                    
-                    adjacent_midpoint = (index_mcp + ring_mcp) / 2
-                    mid_vector = adjacent_midpoint - palm_center
-                    mid_vector = mid_vector / np.linalg.norm(mid_vector)
-                    
-                    middle_vector = middle_mcp - palm_center
-                    middle_vector = middle_vector / np.linalg.norm(middle_vector)
-                    
-                    dot_product = np.dot(middle_vector, mid_vector)
-                    angle = np.degrees(np.arccos(np.clip(dot_product, -1.0, 1.0)))
-                    
-                    cross_product = np.cross(mid_vector, middle_vector)
-                    direction = np.sign(np.dot(cross_product, rotation_matrix[:, 2]))
-                    
-                    abduction = direction * angle
-                else:
-                    mcp_vector = points[chain[1]] - points[chain[0]]
-                    abduction = self.calculate_abduction_angle(mcp_vector, rotation_matrix)
-                
-                # 处理角度数据
-                if finger == 'thumb':
-                    # 拇指角度
-                    angles[f'{finger}_mcp_flexion'] = self.process_angle(
-                        f'{finger}_mcp_flexion', flexion, 0, 50)
-                    angles[f'{finger}_mcp_abduction'] = self.process_angle(
-                        f'{finger}_mcp_abduction', abduction, 0, 70)
-                    
-                    # PIP屈曲
-                    pip_flexion = self.calculate_flexion_angle(
-                        hand_landmarks.landmark[chain[1]],
-                        hand_landmarks.landmark[chain[2]],
-                        hand_landmarks.landmark[chain[3]]
-                    )
-                    angles[f'{finger}_pip_flexion'] = self.process_angle(
-                        f'{finger}_pip_flexion', pip_flexion, 0, 80)
-                    
-                    # DIP屈曲
-                    dip_flexion = self.calculate_flexion_angle(
-                        hand_landmarks.landmark[chain[2]],
-                        hand_landmarks.landmark[chain[3]],
-                        hand_landmarks.landmark[chain[4]]
-                    )
-                    angles[f'{finger}_dip_flexion'] = self.process_angle(
-                        f'{finger}_dip_flexion', dip_flexion, 0, 90)
-                else:
-                    # 其他手指角度
-                    angles[f'{finger}_mcp_flexion'] = self.process_angle(
-                        f'{finger}_mcp_flexion', flexion, 0, 90)
-                    angles[f'{finger}_mcp_abduction'] = self.process_angle(
-                        f'{finger}_mcp_abduction', abduction, -20, 20)
-                    
-                    # PIP屈曲
-                    pip_flexion = self.calculate_flexion_angle(
-                        hand_landmarks.landmark[chain[1]],
-                        hand_landmarks.landmark[chain[2]],
-                        hand_landmarks.landmark[chain[3]]
-                    )
-                    angles[f'{finger}_pip_flexion'] = self.process_angle(
-                        f'{finger}_pip_flexion', pip_flexion, 0, 100)
-                    
-                    # DIP屈曲
-                    dip_flexion = self.calculate_flexion_angle(
-                        hand_landmarks.landmark[chain[2]],
-                        hand_landmarks.landmark[chain[3]],
-                        hand_landmarks.landmark[chain[4]]
-                    )
-                    angles[f'{finger}_dip_flexion'] = self.process_angle(
-                        f'{finger}_dip_flexion', dip_flexion, 0, 90)
-                
         except Exception as e:
             print(f"计算关节角度错误: {e}")
             import traceback
             print(traceback.format_exc())
             return {}
             
-        return angles        
-
-            
+        return angles
 
+    def calculate_angle_sequence(self, points):
+        """离线处理(N, 21, 3)关键点序列，返回(N, 20)平滑后的角度（按JOINT_NAMES顺序）"""
+        return self.process_angles(compute_joint_angles(points))
 
     def calculate_abduction_angle(self, vector, rotation_matrix):
         """计算外展角度"""
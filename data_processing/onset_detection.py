@@ -0,0 +1,157 @@
+import numpy as np
+from scipy import signal
+
+# 分段标记的编码（写入segments/kind）
+SEGMENT_CODES = {'offset': 0, 'onset': 1}
+
+
+class ActivationDetector:
+    """肌肉激活起止的在线检测（包络 + 双阈值）
+
+    包络：滤波EMG全波整流后取各通道均值，再经时间常数envelope_tau（秒）的一阶低通。
+    阈值：reset后前baseline_seconds秒的包络视为静息基线，
+      起始阈值 = 均值 + on_k × 标准差，结束阈值 = 均值 + off_k × 标准差；
+      也可用on_threshold/off_threshold直接指定（两者须同时给出）。
+    包络持续min_active秒高于起始阈值判为激活开始，持续min_rest秒低于结束阈值判为激活结束，
+    标记时间为越过阈值的第一个样本，而非确认时刻。
+    """
+
+    def __init__(self, sampling_rate=200, envelope_tau=0.05, baseline_seconds=1.0, on_k=3.0, off_k=1.5,
+                 min_active=0.1, min_rest=0.2, on_threshold=None, off_threshold=None):
+        self.sampling_rate = sampling_rate
+        self.envelope_tau = envelope_tau
+        self.baseline_samples = max(1, int(round(baseline_seconds * sampling_rate)))
+        self.on_k = on_k
+        self.off_k = off_k
+        self.min_active = max(1, int(round(min_active * sampling_rate)))
+        self.min_rest = max(1, int(round(min_rest * sampling_rate)))
+        if (on_threshold is None) != (off_threshold is None):
+            raise ValueError("on_threshold和off_threshold必须同时指定")
+        self.fixed_thresholds = (on_threshold, off_threshold) if on_threshold is not None else None
+
+        alpha = 1.0 - np.exp(-1.0 / (envelope_tau * sampling_rate))
+        self.envelope_b = np.array([alpha])
+        self.envelope_a = np.array([1.0, alpha - 1.0])
+        self.reset()
+
+    def reset(self):
+        """清空包络和状态，并重新估计静息基线"""
+        self.envelope_zi = np.zeros(1)
+        self.envelope = 0.0
+        self.baseline = []
+        self.baseline_count = 0
+        if self.fixed_thresholds is not None:
+            self.on_threshold, self.off_threshold = self.fixed_thresholds
+        else:
+            self.on_threshold = self.off_threshold = None
+        self.active = False
+        # 候选状态切换：越过阈值的第一个样本时间和持续样本数
+        self.candidate_time = None
+        self.candidate_count = 0
+
+    @property
+    def calibrated(self):
+        return self.on_threshold is not None
+
+    def update(self, samples, timestamps):
+        """输入一块滤波后的样本(n, C)及时间戳，返回本块内确认的标记[(类型, 时间戳)]"""
+        samples = np.asarray(samples, dtype=np.float64)
+        if samples.ndim == 1:
+            samples = samples[None, :]
+        if len(samples) == 0:
+            return []
+        # 整块计算包络
+        rectified = np.abs(samples).mean(axis=1)
+        envelope, self.envelope_zi = signal.lfilter(self.envelope_b, self.envelope_a, rectified,
+                                                    zi=self.envelope_zi)
+        self.envelope = float(envelope[-1])
+
+        start = 0
+        if not self.calibrated:
+            start = self._calibrate(envelope)
+
+        markers = []
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        for value, timestamp in zip(envelope[start:].tolist(), timestamps[start:].tolist()):
+            if self.active:
+                crossing = value < self.off_threshold
+                needed = self.min_rest
+            else:
+                crossing = value > self.on_threshold
+                needed = self.min_active
+            if not crossing:
+                self.candidate_time = None
+                self.candidate_count = 0
+                continue
+            if self.candidate_time is None:
+                self.candidate_time = timestamp
+            self.candidate_count += 1
+            if self.candidate_count >= needed:
+                self.active = not self.active
+                markers.append(('onset' if self.active else 'offset', self.candidate_time))
+                self.candidate_time = None
+                self.candidate_count = 0
+        return markers
+
+    def _calibrate(self, envelope):
+        """累积基线样本，基线足够时计算阈值；返回本块中已用于基线的样本数"""
+        used = min(len(envelope), self.baseline_samples - self.baseline_count)
+        self.baseline.append(envelope[:used])
+        self.baseline_count += used
+        if self.baseline_count >= self.baseline_samples:
+            baseline = np.concatenate(self.baseline)
+            mean, std = baseline.mean(), baseline.std()
+            self.on_threshold = mean + self.on_k * std
+            self.off_threshold = mean + self.off_k * std
+            self.baseline = []
+        return used
+
+    def get_status(self):
+        return {
+            'active': self.active,
+            'calibrated': self.calibrated,
+            'envelope': self.envelope,
+            'on_threshold': self.on_threshold,
+            'off_threshold': self.off_threshold
+        }
+
+
+def detect_segments(filtered, timestamps, **kwargs):
+    """批量模式：对整段滤波EMG检测激活区间，结果与逐块在线检测相同
+
+    返回(M, 2)的[起始时间, 结束时间]；记录结束时仍处于激活的区间以最后一个样本时间结束。
+    """
+    detector = ActivationDetector(**kwargs)
+    markers = detector.update(filtered, timestamps)
+    return segment_intervals([(SEGMENT_CODES[kind], t) for kind, t in markers],
+                             end_time=timestamps[-1] if len(timestamps) else None)
+
+
+def segment_intervals(markers, end_time=None):
+    """把按时间排列的[(编码, 时间戳)]标记配对为(M, 2)激活区间"""
+    intervals = []
+    onset = None
+    for code, timestamp in markers:
+        if code == SEGMENT_CODES['onset']:
+            onset = timestamp
+        elif onset is not None:
+            intervals.append((onset, timestamp))
+            onset = None
+    if onset is not None and end_time is not None:
+        intervals.append((onset, end_time))
+    return np.array(intervals, dtype=np.float64).reshape(-1, 2)
+
+
+def active_range(intervals, pre=0.5, post=0.5):
+    """包含所有激活区间（前后各留pre/post秒）的时间范围，没有激活时返回None"""
+    if len(intervals) == 0:
+        return None
+    return float(intervals[0][0]) - pre, float(intervals[-1][1]) + post
+
+
+def trial_active_range(h5file):
+    """试验文件元数据中自动裁剪标记的激活时间范围（没有标记时返回None）"""
+    attrs = h5file['metadata'].attrs if 'metadata' in h5file else {}
+    if 'active_start_time' not in attrs or 'active_end_time' not in attrs:
+        return None
+    return float(attrs['active_start_time']), float(attrs['active_end_time'])
@@ -0,0 +1,40 @@
+import numpy as np
+
+
+def compute_emg_index(emg_timestamps, hand_timestamps):
+    """计算每个手部帧对应的EMG样本区间 [start, stop)
+
+    区间边界取相邻两帧时间的中点，首尾帧向外延伸半个中位帧间隔，
+    因此各帧区间互不重叠且覆盖该帧前后半帧内的全部EMG样本。
+    """
+    emg_timestamps = np.asarray(emg_timestamps, dtype=np.float64)
+    hand_timestamps = np.asarray(hand_timestamps, dtype=np.float64)
+    num_frames = len(hand_timestamps)
+    if num_frames == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    if num_frames > 1:
+        half_period = np.median(np.diff(hand_timestamps)) / 2
+    else:
+        half_period = 0.5 / 30
+
+    boundaries = np.empty(num_frames + 1, dtype=np.float64)
+    boundaries[0] = hand_timestamps[0] - half_period
+    boundaries[1:-1] = (hand_timestamps[:-1] + hand_timestamps[1:]) / 2
+    boundaries[-1] = hand_timestamps[-1] + half_period
+
+    edges = np.searchsorted(emg_timestamps, boundaries, side='left')
+    return np.stack([edges[:-1], edges[1:]], axis=1).astype(np.int64)
+
+
+def read_aligned_window(h5file, frame_index, fields=('raw', 'filtered')):
+    """读取某个手部帧及其对应的EMG样本区间，只读取所需的数据切片"""
+    start, stop = h5file['hand/emg_index'][frame_index]
+    window = {
+        'hand_timestamp': h5file['hand/timestamps'][frame_index],
+        'hand_angles': h5file['hand/angles'][frame_index],
+        'emg_timestamps': h5file['emg/timestamps'][start:stop]
+    }
+    for field in fields:
+        window[f'emg_{field}'] = h5file[f'emg/{field}'][start:stop]
+    return window
@@ -0,0 +1,273 @@
+import argparse
+import glob
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+import h5py
+import numpy as np
+
+from data_storage.schema import decode_attr
+
+DEFAULT_CATALOG_PATH = os.path.join('data', 'catalog.sqlite')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trials (
+    path TEXT PRIMARY KEY,
+    subject_id TEXT,
+    action TEXT,
+    dominant_hand TEXT,
+    trial_timestamp REAL,
+    recording_start_time REAL,
+    recording_end_time REAL,
+    duration REAL,
+    emg_samples INTEGER,
+    hand_frames INTEGER,
+    emg_rate REAL,
+    hand_rate REAL,
+    layout TEXT,
+    has_video INTEGER,
+    recovered INTEGER,
+    file_size INTEGER,
+    file_mtime REAL,
+    indexed_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_trials_subject ON trials(subject_id);
+CREATE INDEX IF NOT EXISTS idx_trials_action ON trials(action);
+CREATE TABLE IF NOT EXISTS channel_stats (
+    path TEXT,
+    signal TEXT,
+    channel INTEGER,
+    channel_name TEXT,
+    mean REAL,
+    std REAL,
+    min REAL,
+    max REAL,
+    rms REAL,
+    PRIMARY KEY (path, signal, channel)
+);
+"""
+
+TRIAL_COLUMNS = ['path', 'subject_id', 'action', 'dominant_hand', 'trial_timestamp',
+                 'recording_start_time', 'recording_end_time', 'duration', 'emg_samples',
+                 'hand_frames', 'emg_rate', 'hand_rate', 'layout', 'has_video', 'recovered',
+                 'file_size', 'file_mtime', 'indexed_at']
+
+
+def _attr(attrs, key, default=None):
+    return decode_attr(attrs.get(key, default))
+
+
+def _rate(timestamps):
+    if len(timestamps) < 2 or timestamps[-1] <= timestamps[0]:
+        return 0.0
+    return (len(timestamps) - 1) / float(timestamps[-1] - timestamps[0])
+
+
+def _channel_stats(data, signal, names=None):
+    """逐通道统计量（忽略NaN）"""
+    if data.ndim != 2 or len(data) == 0:
+        return []
+    values = data.astype(np.float64)
+    valid = ~np.isnan(values)
+    if not valid.any():
+        return []
+    count = valid.sum(axis=0)
+    filled = np.where(valid, values, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = filled.sum(axis=0) / count
+        mean_square = (filled ** 2).sum(axis=0) / count
+    std = np.sqrt(np.maximum(mean_square - mean ** 2, 0.0))
+    rms = np.sqrt(mean_square)
+    minimum = np.where(valid, values, np.inf).min(axis=0)
+    maximum = np.where(valid, values, -np.inf).max(axis=0)
+    rows = []
+    for ch in range(values.shape[1]):
+        if count[ch] == 0:
+            continue
+        name = str(names[ch]) if names is not None and ch < len(names) else f'{signal}_{ch}'
+        rows.append((signal, ch, name, float(mean[ch]), float(std[ch]),
+                     float(minimum[ch]), float(maximum[ch]), float(rms[ch])))
+    return rows
+
+
+def read_trial_summary(path):
+    """读取单个试验文件的元数据、样本数和逐通道统计量"""
+    with h5py.File(path, 'r') as f:
+        attrs = f['metadata'].attrs if 'metadata' in f else {}
+        stats = []
+        if 'emg' in f:
+            layout = 'streams'
+            emg_timestamps = f['emg/timestamps'][:]
+            hand_timestamps = f['hand/timestamps'][:] if 'hand' in f else np.zeros(0)
+            stats += _channel_stats(f['emg/raw'][:], 'emg_raw')
+            stats += _channel_stats(f['emg/filtered'][:], 'emg_filtered')
+            if 'hand' in f:
+                angles = f['hand/angles']
+                stats += _channel_stats(angles[:], 'hand_angles', angles.attrs.get('joint_names'))
+        else:
+            layout = 'legacy'
+            data = f['data']
+            emg_timestamps = data['timestamps'][:]
+            hand_timestamps = emg_timestamps if 'hand_angles' in data else np.zeros(0)
+            stats += _channel_stats(data['emg_raw'][:], 'emg_raw')
+            stats += _channel_stats(data['emg_filtered'][:], 'emg_filtered')
+            if 'hand_angles' in data:
+                angles = data['hand_angles']
+                stats += _channel_stats(angles[:], 'hand_angles', angles.attrs.get('joint_names'))
+
+        start_time = _attr(attrs, 'recording_start_time')
+        end_time = _attr(attrs, 'recording_end_time')
+        duration = end_time - start_time if start_time is not None and end_time is not None else None
+        stat = os.stat(path)
+        trial = {
+            'path': os.path.normpath(path),
+            'subject_id': None if _attr(attrs, 'subject_id') is None else str(_attr(attrs, 'subject_id')),
+            'action': _attr(attrs, 'action'),
+            'dominant_hand': _attr(attrs, 'dominant_hand'),
+            'trial_timestamp': _attr(attrs, 'trial_timestamp'),
+            'recording_start_time': start_time,
+            'recording_end_time': end_time,
+            'duration': duration,
+            'emg_samples': len(emg_timestamps),
+            'hand_frames': len(hand_timestamps),
+            'emg_rate': _rate(emg_timestamps),
+            'hand_rate': _rate(hand_timestamps),
+            'layout': layout,
+            'has_video': int('video' in f),
+            'recovered': int(bool(_attr(attrs, 'recovered_from_journal', False))),
+            'file_size': stat.st_size,
+            'file_mtime': stat.st_mtime,
+            'indexed_at': time.time()
+        }
+    return trial, stats
+
+
+class TrialCatalog:
+    """data/raw下试验文件的SQLite索引
+
+    保存每个试验的元数据、时长、样本数和逐通道统计量，
+    列出和筛选试验时无需逐个打开HDF5文件。
+    """
+
+    def __init__(self, db_path=DEFAULT_CATALOG_PATH):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # 每次操作使用独立连接，可在保存线程和请求线程中并发使用
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def index_file(self, path):
+        """索引（或更新）一个试验文件"""
+        trial, stats = read_trial_summary(path)
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO trials ({', '.join(TRIAL_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(TRIAL_COLUMNS))})",
+                [trial[column] for column in TRIAL_COLUMNS])
+            conn.execute("DELETE FROM channel_stats WHERE path = ?", (trial['path'],))
+            conn.executemany(
+                "INSERT INTO channel_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(trial['path'],) + row for row in stats])
+        return trial
+
+    def rebuild(self, root=os.path.join('data', 'raw'), force=False):
+        """扫描root，索引新增或修改过的文件，删除已不存在的记录"""
+        paths = {os.path.normpath(p) for p in glob.glob(os.path.join(root, '**', '*.h5'), recursive=True)}
+        with self._connect() as conn:
+            known = {row['path']: (row['file_mtime'], row['file_size'])
+                     for row in conn.execute("SELECT path, file_mtime, file_size FROM trials")}
+            prefix = os.path.normpath(root) + os.sep
+            removed = [p for p in known if p.startswith(prefix) and p not in paths]
+            conn.executemany("DELETE FROM trials WHERE path = ?", [(p,) for p in removed])
+            conn.executemany("DELETE FROM channel_stats WHERE path = ?", [(p,) for p in removed])
+
+        indexed = 0
+        for path in sorted(paths):
+            stat = os.stat(path)
+            if not force and known.get(path) == (stat.st_mtime, stat.st_size):
+                continue
+            try:
+                self.index_file(path)
+                indexed += 1
+            except Exception as e:
+                print(f"索引试验文件失败 {path}: {e}")
+        return {'indexed': indexed, 'removed': len(removed), 'total': len(paths)}
+
+    def query(self, subject_id=None, action=None, dominant_hand=None,
+              min_duration=None, max_duration=None, since=None, until=None, limit=None):
+        """按条件筛选试验，返回字典列表（按开始时间排序）"""
+        conditions = []
+        params = []
+        for column, value in (('subject_id', subject_id), ('action', action),
+                              ('dominant_hand', dominant_hand)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        for column, op, value in (('duration', '>=', min_duration), ('duration', '<=', max_duration),
+                                  ('recording_start_time', '>=', since),
+                                  ('recording_start_time', '<=', until)):
+            if value is not None:
+                conditions.append(f"{column} {op} ?")
+                params.append(value)
+
+        sql = "SELECT * FROM trials"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY recording_start_time"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params)]
+
+    def get_channel_stats(self, path, signal=None):
+        """获取某个试验的逐通道统计量"""
+        sql = "SELECT * FROM channel_stats WHERE path = ?"
+        params = [os.path.normpath(path)]
+        if signal is not None:
+            sql += " AND signal = ?"
+            params.append(signal)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql + " ORDER BY signal, channel", params)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='试验数据目录索引')
+    parser.add_argument('command', choices=['rebuild', 'list'], help='重建索引或列出试验')
+    parser.add_argument('--root', default=os.path.join('data', 'raw'), help='试验数据根目录')
+    parser.add_argument('--db', default=DEFAULT_CATALOG_PATH, help='索引数据库路径')
+    parser.add_argument('--force', action='store_true', help='重新索引所有文件')
+    parser.add_argument('--subject', help='按受试者编号筛选')
+    parser.add_argument('--action', help='按动作筛选')
+    args = parser.parse_args()
+
+    catalog = TrialCatalog(args.db)
+    if args.command == 'rebuild':
+        start = time.perf_counter()
+        result = catalog.rebuild(args.root, force=args.force)
+        print(f"索引完成: {result} ({time.perf_counter() - start:.2f} 秒)")
+    else:
+        start = time.perf_counter()
+        trials = catalog.query(subject_id=args.subject, action=args.action)
+        elapsed = (time.perf_counter() - start) * 1000
+        for trial in trials:
+            duration = trial['duration'] or 0
+            print(f"{trial['path']}  受试者={trial['subject_id']}  动作={trial['action']}  "
+                  f"时长={duration:.1f}s  EMG={trial['emg_samples']}  手部帧={trial['hand_frames']}")
+        print(f"共 {len(trials)} 个试验 (查询耗时 {elapsed:.1f} ms)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+import argparse
+import glob
+import os
+import shutil
+import time
+
+import h5py
+import numpy as np
+
+from data_processing.hand_angles import JOINT_NAMES
+from data_storage.schema import (SCHEMA_VERSION, DEFAULT_COMPRESSION, COMPRESSION_OPTIONS, CHUNK_ROWS,
+                                 NUM_EMG_CHANNELS,
+                                 emg_stream_fields, hand_stream_fields, feature_stream_fields,
+                                 segment_stream_fields, file_schema_version, schema_paths,
+                                 SCHEMA_PATHS, decode_attr)
+from data_storage.trial_writer import TrialWriter
+from data_storage.video_recorder import video_stream_fields
+
+
+def read_trial_arrays(path):
+    """读取任意版本的试验文件，返回元数据和按当前格式组织的数组"""
+    with h5py.File(path, 'r') as f:
+        metadata = {key: decode_attr(value) for key, value in f['metadata'].attrs.items()}
+        version = file_schema_version(f)
+
+        if version == 1:
+            data = f['data']
+            timestamps = data['timestamps'][:]
+            n = len(timestamps)
+            emg = {
+                'timestamps': timestamps,
+                'raw': np.clip(np.rint(data['emg_raw'][:]), -128, 127).astype(np.int8),
+                'filtered': data['emg_filtered'][:].astype(np.float32)
+            }
+            # 旧格式每次轮询一行，手部时间轴沿用轮询时间；按关节名重排到固定顺序。
+            # 没有hand_angles的文件不存在手部帧，写出0行的手部数据流
+            angles_attrs = {}
+            if 'hand_angles' in data:
+                angles = np.full((n, len(JOINT_NAMES)), np.nan, dtype=np.float32)
+                legacy_angles = data['hand_angles'][:]
+                legacy_names = [decode_attr(name) for name in data['hand_angles'].attrs.get('joint_names', [])]
+                for j, name in enumerate(legacy_names):
+                    if name in JOINT_NAMES:
+                        angles[:, JOINT_NAMES.index(name)] = legacy_angles[:, j]
+                hand_timestamps = timestamps
+                # 旧版记录器把缺失的关节填为0，0值不一定是实测角度
+                angles_attrs['legacy_missing_filled_with_zero'] = True
+            else:
+                angles = np.zeros((0, len(JOINT_NAMES)), dtype=np.float32)
+                hand_timestamps = np.zeros(0, dtype=np.float64)
+            # 旧格式没有原始关键点，只迁移时间戳和角度
+            hand = {
+                'timestamps': hand_timestamps,
+                'angles': angles
+            }
+            joint_names = list(JOINT_NAMES)
+            extra = {'dataset_attrs': {'hand/angles': angles_attrs}}
+        else:
+            emg = {name: f['emg'][name][:] for name, _, _ in emg_stream_fields()}
+            joint_names = [decode_attr(name) for name in f['hand/angles'].attrs['joint_names']]
+            hand = {name: f['hand'][name][:]
+                    for name, _, _ in hand_stream_fields(len(joint_names)) if name in f['hand']}
+            # 保留各数据集的原有属性（如hand/handedness的编码）
+            extra = {'dataset_attrs': {
+                f'{stream}/{name}': dict(f[stream][name].attrs)
+                for stream, arrays in (('emg', emg), ('hand', hand)) for name in arrays
+                if len(f[stream][name].attrs)
+            }}
+            if 'video' in f:
+                extra['video'] = {
+                    'timestamps': f['video/timestamps'][:],
+                    'camera_frame_index': f['video/camera_frame_index'][:],
+                    'dropped_timestamps': f['video/dropped_timestamps'][:],
+                    'attrs': dict(f['video'].attrs)
+                }
+            if 'features' in f:
+                extra['features'] = {
+                    'timestamps': f['features/timestamps'][:],
+                    'values': f['features/values'][:],
+                    'feature_names': [decode_attr(name) for name in f['features/values'].attrs['feature_names']]
+                }
+            if 'segments' in f:
+                extra['segments'] = {
+                    'timestamps': f['segments/timestamps'][:],
+                    'kind': f['segments/kind'][:],
+                    'attrs': dict(f['segments/kind'].attrs)
+                }
+
+        # 离线处理结果（batch_filter写入的processed/组），与原始EMG逐行对应
+        raw_path, processed_path = SCHEMA_PATHS[version]['emg_raw'], SCHEMA_PATHS[version]['processed']
+        if processed_path in f:
+            extra['processed'] = {}
+            for name, dataset in f[processed_path].items():
+                attrs = dict(dataset.attrs)
+                if decode_attr(attrs.get('source')) == raw_path:
+                    attrs['source'] = SCHEMA_PATHS[SCHEMA_VERSION]['emg_raw']
+                extra['processed'][name] = {'data': dataset[:], 'attrs': attrs}
+    return version, metadata, emg, hand, joint_names, extra
+
+
+def write_current_schema(path, metadata, emg, hand, joint_names, extra, compression):
+    """按当前格式写出试验文件"""
+    streams = {
+        'emg': emg_stream_fields(emg['raw'].shape[1] if emg['raw'].ndim == 2 else NUM_EMG_CHANNELS),
+        'hand': [field for field in hand_stream_fields(len(joint_names)) if field[0] in hand]
+    }
+    if 'video' in extra:
+        streams['video'] = video_stream_fields()
+    dataset_attrs = dict(extra.get('dataset_attrs', {}))
+    dataset_attrs['hand/angles'] = dict(dataset_attrs.get('hand/angles', {}), joint_names=joint_names)
+    if 'features' in extra:
+        values = extra['features']['values']
+        streams['features'] = feature_stream_fields(values.shape[1], values.shape[2])
+        dataset_attrs['features/values'] = {'feature_names': extra['features']['feature_names']}
+    if 'segments' in extra:
+        streams['segments'] = segment_stream_fields()
+        dataset_attrs['segments/kind'] = extra['segments']['attrs']
+
+    end_time = metadata.pop('recording_end_time', None)
+    writer = TrialWriter(
+        path, metadata, streams,
+        dataset_attrs=dataset_attrs,
+        static_datasets={'hand/joint_names': joint_names},
+        compression=compression)
+    writer.append('emg', *[np.asarray(emg[name]).astype(dtype, copy=False)
+                           for name, _, dtype in streams['emg']])
+    writer.append('hand', *[np.asarray(hand[name]).astype(dtype, copy=False)
+                            for name, _, dtype in streams['hand']])
+    if 'video' in extra:
+        video = extra['video']
+        writer.append('video', video['timestamps'], video['camera_frame_index'])
+        writer.write_dataset('video/dropped_timestamps', video['dropped_timestamps'])
+        writer.set_attrs('video', video['attrs'])
+    if 'features' in extra:
+        writer.append('features', extra['features']['timestamps'], extra['features']['values'])
+    if 'segments' in extra:
+        writer.append('segments', extra['segments']['timestamps'], extra['segments']['kind'])
+    processed_path = SCHEMA_PATHS[SCHEMA_VERSION]['processed']
+    for name, dataset in extra.get('processed', {}).items():
+        writer.write_dataset(f'{processed_path}/{name}', dataset['data'], dataset['attrs'],
+                             chunk_rows=CHUNK_ROWS['emg'])
+    writer.close(end_time=end_time)
+
+
+# 各版本中内容相同的核心数据集：时间戳、原始/滤波EMG和关节角度
+CORE_DATASETS = ('emg_timestamps', 'emg_raw', 'emg_filtered', 'hand_angles')
+
+
+def measure_read_time(path, repeats=5):
+    """读取核心数据集的耗时（秒，取最小值）"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with h5py.File(path, 'r') as f:
+            paths = schema_paths(f)
+            for name in CORE_DATASETS:
+                if paths[name] in f:
+                    f[paths[name]][...]
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def migrate_file(path, output_path=None, compression=DEFAULT_COMPRESSION, keep_original=False):
+    """把单个文件改写为当前格式，返回大小和读取速度对比"""
+    output_path = output_path or path
+    size_before = os.path.getsize(path)
+    read_before = measure_read_time(path)
+
+    version, metadata, emg, hand, joint_names, extra = read_trial_arrays(path)
+    # 多次迁移时保留最初的格式版本
+    metadata.setdefault('migrated_from_schema_version', version)
+
+    temp_path = output_path + '.migrating'
+    write_current_schema(temp_path, metadata, emg, hand, joint_names, extra, compression)
+    if keep_original and os.path.abspath(output_path) == os.path.abspath(path):
+        shutil.copy2(path, path + f'.v{version}.bak')
+    os.replace(temp_path, output_path)
+
+    size_after = os.path.getsize(output_path)
+    read_after = measure_read_time(output_path)
+    return {
+        'path': output_path,
+        'from_version': version,
+        'size_before': size_before,
+        'size_after': size_after,
+        'read_before': read_before,
+        'read_after': read_after
+    }
+
+
+def needs_migration(path, compression=DEFAULT_COMPRESSION):
+    with h5py.File(path, 'r') as f:
+        if 'schema_version' not in f.attrs:
+            return True
+        return (int(f.attrs['schema_version']) < SCHEMA_VERSION
+                or decode_attr(f.attrs.get('compression')) != compression)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='把试验文件迁移到当前数据格式')
+    parser.add_argument('--root', default=os.path.join('data', 'raw'), help='试验数据根目录')
+    parser.add_argument('--output', help='输出目录（默认原地改写）')
+    parser.add_argument('--compression', default=DEFAULT_COMPRESSION,
+                        choices=sorted(COMPRESSION_OPTIONS), help='压缩方式')
+    parser.add_argument('--keep-original', action='store_true', help='原地改写时保留原文件备份')
+    parser.add_argument('--force', action='store_true', help='已是当前格式的文件也重新写出')
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.root, '**', '*.h5'), recursive=True))
+    total_before = total_after = 0
+    read_before = read_after = 0.0
+    migrated = 0
+    for path in paths:
+        if not args.force and not needs_migration(path, args.compression):
+            continue
+        output_path = None
+        if args.output:
+            output_path = os.path.join(args.output, os.path.relpath(path, args.root))
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        try:
+            result = migrate_file(path, output_path, args.compression, args.keep_original)
+        except Exception as e:
+            print(f"迁移失败 {path}: {e}")
+            continue
+
+        migrated += 1
+        total_before += result['size_before']
+        total_after += result['size_after']
+        read_before += result['read_before']
+        read_after += result['read_after']
+        print(f"{path}: v{result['from_version']} -> v{SCHEMA_VERSION}  "
+              f"{result['size_before'] / 1024:.1f} KB -> {result['size_after'] / 1024:.1f} KB  "
+              f"读取 {result['read_before'] * 1000:.2f} ms -> {result['read_after'] * 1000:.2f} ms")
+
+    if migrated:
+        print(f"\n共迁移 {migrated} 个文件: "
+              f"{total_before / 1024:.1f} KB -> {total_after / 1024:.1f} KB "
+              f"({total_after / max(total_before, 1) * 100:.1f}%), "
+              f"读取 {read_before * 1000:.2f} ms -> {read_after * 1000:.2f} ms")
+    else:
+        print("没有需要迁移的文件")
+
+
+if __name__ == '__main__':
+    main()
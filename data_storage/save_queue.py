@@ -0,0 +1,93 @@
+import os
+import queue
+import time
+import uuid
+from collections import OrderedDict
+from threading import Thread, Lock
+
+
+def fsync_file(filepath):
+    """确保文件真正写入磁盘（文件不存在时忽略）"""
+    if filepath and os.path.exists(filepath):
+        with open(filepath, 'rb') as f:
+            os.fsync(f.fileno())
+
+
+class TrialSaveQueue:
+    """后台试验保存队列
+
+    /stop_recording只提交保存任务并立即返回任务ID，
+    由后台写入线程完成文件关闭和落盘（fsync）。
+    """
+
+    def __init__(self, max_pending=4, history_size=100):
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.lock = Lock()
+        self.job_status = OrderedDict()
+        self.history_size = history_size
+        self.worker = None
+
+    def start(self):
+        """启动后台写入线程"""
+        with self.lock:
+            if self.worker and self.worker.is_alive():
+                return
+            self.worker = Thread(target=self._run, daemon=True)
+            self.worker.start()
+
+    def submit(self, save_func, filepath=None, timeout=1.0):
+        """提交保存任务，返回任务ID
+
+        队列已满时在当前线程同步保存，保证数据不丢失。
+        """
+        self.start()
+        job_id = uuid.uuid4().hex[:12]
+        self._set_status(job_id, status='pending', filepath=filepath,
+                         submitted_at=time.time(), finished_at=None, message='')
+        try:
+            self.jobs.put((job_id, save_func, filepath), timeout=timeout)
+        except queue.Full:
+            print("保存队列已满，改为同步保存")
+            self._execute(job_id, save_func, filepath)
+        return job_id
+
+    def get_status(self, job_id=None):
+        """获取单个任务或全部近期任务的状态"""
+        with self.lock:
+            if job_id is not None:
+                status = self.job_status.get(job_id)
+                return dict(status) if status else None
+            return {jid: dict(status) for jid, status in self.job_status.items()}
+
+    def pending_count(self):
+        return self.jobs.qsize()
+
+    def wait_all(self):
+        """等待所有已提交的任务完成"""
+        self.jobs.join()
+
+    def _set_status(self, job_id, **fields):
+        with self.lock:
+            status = self.job_status.setdefault(job_id, {'job_id': job_id})
+            status.update(fields)
+            # 只保留最近的任务记录
+            while len(self.job_status) > self.history_size:
+                self.job_status.popitem(last=False)
+
+    def _execute(self, job_id, save_func, filepath):
+        self._set_status(job_id, status='saving')
+        try:
+            save_func()
+            fsync_file(filepath)
+            self._set_status(job_id, status='done', finished_at=time.time())
+        except Exception as e:
+            print(f"后台保存错误: {e}")
+            self._set_status(job_id, status='error', message=str(e), finished_at=time.time())
+
+    def _run(self):
+        while True:
+            job_id, save_func, filepath = self.jobs.get()
+            try:
+                self._execute(job_id, save_func, filepath)
+            finally:
+                self.jobs.task_done()
@@ -0,0 +1,131 @@
+# 试验文件的数据流布局
+# 每个数据流对应文件中的一个组（如emg/、hand/），组内各数据集共享同一时间轴。
+# 字段定义为 (名称, 单样本形状, 数据类型)。
+#
+# 文件格式版本（根组属性schema_version）：
+#   1 - 旧版data/单时间轴布局（每次轮询一行，全部float64，无分块压缩）
+#   2 - emg/、hand/双时间轴布局，显式数据类型，按时间窗口分块并压缩
+
+import numpy as np
+
+SCHEMA_VERSION = 2
+
+NUM_EMG_CHANNELS = 8
+NUM_HAND_LANDMARKS = 21
+
+# hand/handedness的编码
+HANDEDNESS_CODES = {'Left': 0, 'Right': 1}
+NO_HAND = -1
+
+# 各数据流默认的写出块大小（行数）
+DEFAULT_BLOCK_SIZES = {
+    'emg': 256,   # 200 Hz，约1.3秒
+    'hand': 64,   # 30 fps，约2秒
+    'video': 64,
+    'features': 32,  # 每10个EMG样本一帧（20 Hz），约1.6秒
+    'segments': 1    # 激活起止标记很少，逐条写出
+}
+
+# 各数据流的分块行数：约10秒数据（每块16~64 KB），整段读取时分块数少，
+# 按1秒左右的时间窗口读取时也只需解压一两个分块
+CHUNK_ROWS = {
+    'emg': 2048,
+    'hand': 256,
+    'video': 256,
+    'features': 256,
+    'segments': 64
+}
+
+# 可选的压缩过滤器；gzip可被MATLAB等工具直接读取，lzf速度更快但仅h5py支持
+COMPRESSION_OPTIONS = {
+    'none': {},
+    'gzip': {'compression': 'gzip', 'compression_opts': 4, 'shuffle': True},
+    'lzf': {'compression': 'lzf', 'shuffle': True}
+}
+DEFAULT_COMPRESSION = 'gzip'
+
+
+def dataset_options(compression=DEFAULT_COMPRESSION):
+    """压缩过滤器对应的create_dataset参数"""
+    if compression not in COMPRESSION_OPTIONS:
+        raise ValueError(f"不支持的压缩方式: {compression}")
+    return dict(COMPRESSION_OPTIONS[compression])
+
+
+# 各格式版本中核心数据集的位置；processed为batch_filter离线处理结果所在的组
+SCHEMA_PATHS = {
+    1: {
+        'emg_timestamps': 'data/timestamps',
+        'emg_raw': 'data/emg_raw',
+        'emg_filtered': 'data/emg_filtered',
+        'hand_angles': 'data/hand_angles',
+        'processed': 'data/processed'
+    },
+    2: {
+        'emg_timestamps': 'emg/timestamps',
+        'emg_raw': 'emg/raw',
+        'emg_filtered': 'emg/filtered',
+        'hand_angles': 'hand/angles',
+        'processed': 'emg/processed'
+    }
+}
+
+
+def file_schema_version(h5file):
+    """文件的格式版本（缺少属性时按布局推断）"""
+    if 'schema_version' in h5file.attrs:
+        return int(h5file.attrs['schema_version'])
+    return 2 if 'emg' in h5file else 1
+
+
+def schema_paths(h5file):
+    """文件所用格式版本中核心数据集的位置"""
+    return SCHEMA_PATHS[file_schema_version(h5file)]
+
+
+def decode_attr(value):
+    """HDF5属性值转为Python值（bytes解码为str，numpy标量转为Python数值）"""
+    if isinstance(value, bytes):
+        return value.decode('utf-8')
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def emg_stream_fields(num_channels=NUM_EMG_CHANNELS):
+    """EMG数据流：Myo原生采样率"""
+    return [
+        ('timestamps', (), 'float64'),
+        ('raw', (num_channels,), 'int8'),
+        ('filtered', (num_channels,), 'float32')
+    ]
+
+
+def hand_stream_fields(num_joints):
+    """手部数据流：RealSense帧率，未检测到手部的帧角度和关键点为NaN
+
+    landmarks保存MediaPipe原始关键点(21×3)，便于离线重新计算角度。
+    """
+    return [
+        ('timestamps', (), 'float64'),
+        ('angles', (num_joints,), 'float32'),
+        ('landmarks', (NUM_HAND_LANDMARKS, 3), 'float32'),
+        ('handedness', (), 'int8'),
+        ('confidence', (), 'float32')
+    ]
+
+
+def feature_stream_fields(num_features, num_channels=NUM_EMG_CHANNELS):
+    """EMG特征数据流：每个滑动窗口结束时一帧，values为(特征数, 通道数)"""
+    return [
+        ('timestamps', (), 'float64'),
+        ('values', (num_features, num_channels), 'float32')
+    ]
+
+
+def segment_stream_fields():
+    """肌肉激活起止标记：kind按SEGMENT_CODES编码（1=开始，0=结束）"""
+    return [
+        ('timestamps', (), 'float64'),
+        ('kind', (), 'int8')
+    ]
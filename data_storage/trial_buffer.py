@@ -0,0 +1,49 @@
+import numpy as np
+
+
+class TrialBuffer:
+    """预分配、可增长的数据流记录缓冲区
+
+    每个字段是一个预分配的NumPy数组（如int8原始EMG、float32滤波EMG、
+    float64时间戳），按行追加样本。写出时直接取[:size]切片，无需逐样本转换。
+    """
+
+    def __init__(self, fields, capacity=1024):
+        self.fields = list(fields)
+        self.size = 0
+        self.arrays = [
+            np.empty((capacity,) + tuple(shape), dtype=dtype)
+            for _, shape, dtype in self.fields
+        ]
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def capacity(self):
+        return len(self.arrays[0])
+
+    def _grow(self):
+        """容量翻倍，保留已有数据"""
+        new_capacity = max(1, self.capacity * 2)
+        for i, old in enumerate(self.arrays):
+            new = np.empty((new_capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            self.arrays[i] = new
+
+    def append(self, *values):
+        """按字段顺序追加一个样本"""
+        if self.size >= self.capacity:
+            self._grow()
+        i = self.size
+        for array, value in zip(self.arrays, values):
+            array[i] = value
+        self.size += 1
+
+    def view(self):
+        """按字段顺序返回有效数据的数组切片（不复制）"""
+        return tuple(array[:self.size] for array in self.arrays)
+
+    def clear(self):
+        """清空缓冲区，保留已分配的内存"""
+        self.size = 0
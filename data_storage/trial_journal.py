@@ -0,0 +1,245 @@
+import glob
+import json
+import os
+import queue
+import struct
+import time
+from threading import Thread
+
+import h5py
+import numpy as np
+
+from data_storage.schema import DEFAULT_COMPRESSION
+from data_storage.trial_writer import TrialWriter
+
+JOURNAL_MAGIC = b'TRIALJ1\n'
+JOURNAL_SUFFIX = '.journal'
+
+# 非数据流记录的编号：属性更新和一次性写入的数据集，内容为JSON
+ATTRS_RECORD = 254
+DATASET_RECORD = 255
+
+
+def record_dtype(fields):
+    """数据流单条记录的紧凑二进制结构"""
+    return np.dtype([(name, dtype, tuple(shape)) for name, shape, dtype in fields])
+
+
+class TrialJournal:
+    """进行中试验的追加式预写日志
+
+    采集线程只把样本放入无锁队列，由后台线程打包为二进制记录追加到日志文件，
+    并定期fsync。进程崩溃后可用replay_journal重建完整的.h5文件。
+
+    文件格式：魔数 | 头部长度(uint32) | JSON头部 | 记录...
+    每条记录为 数据流编号(uint8) + 该数据流结构化dtype的字节；
+    属性更新和一次性写入的数据集为 ATTRS_RECORD/DATASET_RECORD(uint8) + 长度(uint32) + JSON。
+    """
+
+    def __init__(self, path, target_filepath, metadata, streams, dataset_attrs=None,
+                 static_datasets=None, compression=DEFAULT_COMPRESSION, fsync_interval=0.5):
+        self.path = path
+        self.fsync_interval = fsync_interval
+        self.stream_ids = {name: i for i, name in enumerate(streams)}
+        self.record_dtypes = [record_dtype(fields) for fields in streams.values()]
+        self.queue = queue.SimpleQueue()
+        self.records_written = 0
+
+        header = json.dumps({
+            'target_filepath': target_filepath,
+            'metadata': metadata,
+            'streams': {name: [[f, list(shape), dtype] for f, shape, dtype in fields]
+                        for name, fields in streams.items()},
+            'dataset_attrs': dataset_attrs or {},
+            'static_datasets': static_datasets or {},
+            'compression': compression
+        }, ensure_ascii=False).encode('utf-8')
+
+        self.file = open(path, 'wb')
+        self.file.write(JOURNAL_MAGIC)
+        self.file.write(struct.pack('<I', len(header)))
+        self.file.write(header)
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+        self.worker = Thread(target=self._run, daemon=True)
+        self.worker.start()
+
+    def append(self, stream, *values):
+        """记录一个样本（采集线程调用，只入队不做I/O）"""
+        self.queue.put((self.stream_ids[stream], values))
+
+    def set_attrs(self, path, attrs):
+        """记录组或数据集的属性更新（与TrialWriter.set_attrs对应）"""
+        self.queue.put((ATTRS_RECORD, {'path': path, 'attrs': attrs}))
+
+    def write_dataset(self, path, data):
+        """记录一次性写入的数据集（与TrialWriter.write_dataset对应）"""
+        data = np.asarray(data)
+        self.queue.put((DATASET_RECORD, {'path': path, 'data': data.tolist(), 'dtype': data.dtype.str}))
+
+    def _write_pending(self, item):
+        """写出队列中已有的记录，遇到关闭标记时返回True"""
+        while item is not None:
+            stream_id, values = item
+            if stream_id in (ATTRS_RECORD, DATASET_RECORD):
+                # numpy标量按Python数值写出
+                payload = json.dumps(values, ensure_ascii=False,
+                                     default=lambda value: value.tolist()).encode('utf-8')
+                self.file.write(struct.pack('<BI', stream_id, len(payload)))
+                self.file.write(payload)
+            else:
+                record = np.array([tuple(values)], dtype=self.record_dtypes[stream_id])
+                self.file.write(struct.pack('<B', stream_id))
+                self.file.write(record.tobytes())
+            self.records_written += 1
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                return False
+        return True
+
+    def _run(self):
+        last_sync = time.time()
+        closing = False
+        while not closing:
+            try:
+                item = self.queue.get(timeout=self.fsync_interval)
+                closing = item is None or self._write_pending(item)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"日志写入错误: {e}")
+            try:
+                now = time.time()
+                if closing or now - last_sync >= self.fsync_interval:
+                    self.file.flush()
+                    os.fsync(self.file.fileno())
+                    last_sync = now
+            except Exception as e:
+                print(f"日志写入错误: {e}")
+
+    def close(self):
+        """写完队列中剩余的记录并关闭日志"""
+        if self.file is None:
+            return
+        self.queue.put(None)
+        self.worker.join()
+        self.file.close()
+        self.file = None
+
+    def discard(self):
+        """试验文件已落盘，删除日志"""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def read_journal(path):
+    """读取日志，返回头部、按数据流分组的记录数组和按顺序的属性/数据集记录
+
+    忽略末尾不完整的记录。
+    """
+    with open(path, 'rb') as f:
+        content = f.read()
+    if not content.startswith(JOURNAL_MAGIC):
+        raise ValueError(f"不是有效的试验日志: {path}")
+
+    offset = len(JOURNAL_MAGIC)
+    (header_length,) = struct.unpack_from('<I', content, offset)
+    offset += 4
+    header = json.loads(content[offset:offset + header_length].decode('utf-8'))
+    offset += header_length
+
+    streams = {name: [(f, tuple(shape), dtype) for f, shape, dtype in fields]
+               for name, fields in header['streams'].items()}
+    names = list(streams)
+    dtypes = [record_dtype(fields) for fields in streams.values()]
+    chunks = {name: [] for name in names}
+    operations = []
+
+    while offset < len(content):
+        stream_id = content[offset]
+        if stream_id in (ATTRS_RECORD, DATASET_RECORD):
+            if offset + 5 > len(content):
+                break
+            (length,) = struct.unpack_from('<I', content, offset + 1)
+            if offset + 5 + length > len(content):
+                break
+            operations.append((stream_id, json.loads(content[offset + 5:offset + 5 + length].decode('utf-8'))))
+            offset += 5 + length
+            continue
+        if stream_id >= len(dtypes):
+            print(f"日志记录损坏，停止读取: {path}")
+            break
+        size = dtypes[stream_id].itemsize
+        if offset + 1 + size > len(content):
+            break  # 崩溃时未写完的记录
+        chunks[names[stream_id]].append(content[offset + 1:offset + 1 + size])
+        offset += 1 + size
+
+    records = {
+        name: np.frombuffer(b''.join(chunks[name]), dtype=dtype)
+        for name, dtype in zip(names, dtypes)
+    }
+    return header, streams, records, operations
+
+
+def replay_journal(path, target_filepath=None):
+    """根据日志重建试验HDF5文件，返回重建的文件路径"""
+    header, streams, records, operations = read_journal(path)
+    filepath = target_filepath or header['target_filepath']
+
+    metadata = dict(header['metadata'])
+    metadata['recovered_from_journal'] = True
+    writer = TrialWriter(filepath, metadata, streams, dataset_attrs=header['dataset_attrs'],
+                         static_datasets=header.get('static_datasets'),
+                         compression=header.get('compression', DEFAULT_COMPRESSION))
+
+    end_time = metadata.get('recording_start_time') or time.time()
+    for name, fields in streams.items():
+        data = records[name]
+        if len(data) == 0:
+            continue
+        writer.append(name, *[data[field] for field, _, _ in fields])
+        if 'timestamps' in data.dtype.names:
+            end_time = max(end_time, float(data['timestamps'][-1]))
+    for kind, operation in operations:
+        if kind == ATTRS_RECORD:
+            writer.set_attrs(operation['path'], operation['attrs'])
+        else:
+            writer.write_dataset(operation['path'], np.asarray(operation['data'], dtype=operation['dtype']))
+
+    writer.close(end_time=end_time)
+    return filepath
+
+
+def trial_file_complete(filepath):
+    """试验文件能正常打开且已写入结束时间（已正常关闭）"""
+    try:
+        with h5py.File(filepath, 'r') as f:
+            return 'metadata' in f and 'recording_end_time' in f['metadata'].attrs
+    except (OSError, KeyError):
+        return False
+
+
+def recover_journals(root):
+    """重放root下所有残留的日志（上次运行未正常结束的试验）
+
+    试验文件已完整保存、只是日志尚未删除时直接删除日志，不覆盖已保存的文件。
+    """
+    recovered = []
+    for path in sorted(glob.glob(os.path.join(root, '**', '*' + JOURNAL_SUFFIX), recursive=True)):
+        try:
+            header = read_journal(path)[0]
+            if trial_file_complete(header['target_filepath']):
+                os.remove(path)
+                print(f"试验文件已完整保存，删除残留日志: {path}")
+                continue
+            filepath = replay_journal(path)
+            os.remove(path)
+            recovered.append(filepath)
+            print(f"已从日志恢复试验数据: {filepath}")
+        except Exception as e:
+            print(f"日志恢复失败 {path}: {e}")
+    return recovered
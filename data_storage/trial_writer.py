@@ -0,0 +1,120 @@
+import time
+from threading import Lock
+
+import h5py
+import numpy as np
+
+from data_storage.alignment import compute_emg_index
+from data_storage.schema import (SCHEMA_VERSION, DEFAULT_BLOCK_SIZES, CHUNK_ROWS,
+                                 DEFAULT_COMPRESSION, dataset_options)
+
+
+class TrialWriter:
+    """边记录边写入的HDF5试验文件
+
+    每个数据流（emg/、hand/）是一个独立时间轴的组，组内数据集均为可扩展的
+    分块压缩数据集，记录过程中按固定大小的数据块追加。停止记录时写入结束时间、
+    手部帧到EMG样本区间的索引（hand/emg_index），然后刷新并关闭文件。
+    """
+
+    def __init__(self, filepath, metadata, streams, block_sizes=None, dataset_attrs=None,
+                 static_datasets=None, compression=DEFAULT_COMPRESSION):
+        self.filepath = filepath
+        self.compression = compression
+        self.block_sizes = dict(DEFAULT_BLOCK_SIZES)
+        self.block_sizes.update(block_sizes or {})
+        self.lock = Lock()
+        self.datasets = {}
+        self.rows_written = {}
+
+        self.file = h5py.File(filepath, 'w')
+        self.file.attrs['schema_version'] = SCHEMA_VERSION
+        self.file.attrs['compression'] = compression
+        options = dataset_options(compression)
+
+        # 创建元数据组
+        meta_group = self.file.create_group('metadata')
+        for key, value in metadata.items():
+            if value is not None:
+                meta_group.attrs[key] = value
+
+        # 为每个数据流创建可扩展的数据集
+        for stream, fields in streams.items():
+            group = self.file.create_group(stream)
+            chunk_rows = CHUNK_ROWS.get(stream, 256)
+            self.datasets[stream] = [
+                group.create_dataset(
+                    name, shape=(0,) + tuple(shape), maxshape=(None,) + tuple(shape),
+                    chunks=(chunk_rows,) + tuple(shape), dtype=dtype, **options)
+                for name, shape, dtype in fields
+            ]
+            self.rows_written[stream] = 0
+
+        # 不随时间变化的数据集，如关节名称
+        for path, data in (static_datasets or {}).items():
+            data = np.asarray(data)
+            if data.dtype.kind in 'US':
+                data = data.astype(h5py.string_dtype())
+            self.file.create_dataset(path, data=data)
+
+        for path, attrs in (dataset_attrs or {}).items():
+            for key, value in attrs.items():
+                self.file[path].attrs[key] = value
+
+    def block_size(self, stream):
+        return self.block_sizes.get(stream, 256)
+
+    def append(self, stream, *blocks):
+        """按字段顺序向数据流追加一个数据块"""
+        n = len(blocks[0])
+        if n == 0:
+            return
+        with self.lock:
+            start = self.rows_written[stream]
+            end = start + n
+            for dataset, block in zip(self.datasets[stream], blocks):
+                dataset.resize(end, axis=0)
+                dataset[start:end] = block
+            self.rows_written[stream] = end
+
+    def set_attrs(self, path, attrs):
+        """设置组或数据集的属性"""
+        with self.lock:
+            for key, value in attrs.items():
+                self.file[path].attrs[key] = value
+
+    def write_dataset(self, path, data, attrs=None, chunk_rows=None):
+        """一次性写入一个完整的数据集（如停止时才得到的结果表）
+
+        给定chunk_rows时按文件的压缩方式分块压缩。
+        """
+        data = np.asarray(data)
+        options = {}
+        if chunk_rows and len(data) and self.compression != 'none':
+            options = dataset_options(self.compression)
+            options['chunks'] = (min(chunk_rows, len(data)),) + data.shape[1:]
+        with self.lock:
+            dataset = self.file.create_dataset(path, data=data, **options)
+            for key, value in (attrs or {}).items():
+                dataset.attrs[key] = value
+
+    def _write_emg_index(self):
+        if 'emg' not in self.file or 'hand' not in self.file:
+            return
+        emg_index = compute_emg_index(self.file['emg/timestamps'][:],
+                                      self.file['hand/timestamps'][:])
+        dataset = self.file['hand'].create_dataset('emg_index', data=emg_index)
+        dataset.attrs['description'] = '每个手部帧对应的EMG样本区间 [start, stop)'
+
+    def close(self, end_time=None):
+        """写入结束时间和对齐索引，刷新并关闭文件"""
+        with self.lock:
+            if self.file is None:
+                return
+            self.file['metadata'].attrs['recording_end_time'] = end_time or time.time()
+            self._write_emg_index()
+            self.file.flush()
+            self.file.close()
+            self.file = None
+            counts = ', '.join(f'{stream}: {n}' for stream, n in self.rows_written.items())
+            print(f"数据保存完成: {self.filepath} ({counts})")
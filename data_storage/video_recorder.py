@@ -0,0 +1,117 @@
+import queue
+from threading import Thread, Lock
+
+import cv2
+import numpy as np
+
+
+def video_stream_fields():
+    """视频帧时间戳表：每个已编码视频帧对应的相机帧"""
+    return [
+        ('timestamps', (), 'float64'),
+        ('camera_frame_index', (), 'int64')
+    ]
+
+
+class VideoSession:
+    """单次试验的视频编码会话，拥有自己的帧队列和编码线程"""
+
+    def __init__(self, filepath, fps, fourcc, max_queue):
+        self.filepath = filepath
+        self.fps = fps
+        self.fourcc = fourcc
+        self.frames = queue.Queue(maxsize=max_queue)
+        self.encoded_timestamps = []
+        self.encoded_frame_indices = []
+        self.dropped_frames = 0
+        self.dropped_timestamps = []
+        self.worker = Thread(target=self._encode, daemon=True)
+        self.worker.start()
+
+    def submit(self, timestamp, frame_index, image):
+        """放入一帧；队列已满时丢弃该帧并计数"""
+        try:
+            self.frames.put_nowait((timestamp, frame_index, image))
+        except queue.Full:
+            self.dropped_frames += 1
+            self.dropped_timestamps.append(timestamp)
+
+    def _encode(self):
+        writer = None
+        while True:
+            item = self.frames.get()
+            if item is None:
+                break
+            timestamp, frame_index, image = item
+            try:
+                if writer is None:
+                    height, width = image.shape[:2]
+                    writer = cv2.VideoWriter(self.filepath, cv2.VideoWriter_fourcc(*self.fourcc),
+                                             self.fps, (width, height))
+                writer.write(image)
+                self.encoded_timestamps.append(timestamp)
+                self.encoded_frame_indices.append(frame_index)
+            except Exception as e:
+                print(f"视频编码错误: {e}")
+        if writer is not None:
+            writer.release()
+
+    def finish(self):
+        """等待编码线程写完队列中的帧，返回时间戳表"""
+        self.frames.put(None)
+        self.worker.join()
+        return {
+            'filepath': self.filepath,
+            'timestamps': np.array(self.encoded_timestamps, dtype=np.float64),
+            'camera_frame_index': np.array(self.encoded_frame_indices, dtype=np.int64),
+            'dropped_frames': self.dropped_frames,
+            'dropped_timestamps': np.array(self.dropped_timestamps, dtype=np.float64)
+        }
+
+
+class VideoRecorder:
+    """RealSense彩色图像同步视频录制器
+
+    相机处理线程只把帧放入有界队列，由专用编码线程写入视频文件，
+    因此不会阻塞process_frame。编码跟不上时丢弃新到达的帧并计数，
+    丢帧只取决于队列状态，时间戳表中只包含实际写入视频的帧。
+    """
+
+    def __init__(self, fps=30, fourcc='mp4v', max_queue=30):
+        self.fps = fps
+        self.fourcc = fourcc
+        self.max_queue = max_queue
+        self.lock = Lock()
+        self.session = None
+        self.collector = None
+
+    def attach(self, realsense_collector):
+        """绑定相机；只在录制期间订阅带原始图像的帧，避免空闲时逐帧复制图像"""
+        self.collector = realsense_collector
+
+    def detach(self, realsense_collector):
+        realsense_collector.remove_frame_listener(self.on_frame)
+        self.collector = None
+
+    def start(self, filepath):
+        """开始录制到filepath"""
+        with self.lock:
+            self.session = VideoSession(filepath, self.fps, self.fourcc, self.max_queue)
+        if self.collector is not None:
+            self.collector.add_frame_listener(self.on_frame, with_image=True)
+
+    def stop(self):
+        """停止接收新帧，返回会话（调用session.finish()等待编码完成）"""
+        if self.collector is not None:
+            self.collector.remove_frame_listener(self.on_frame)
+        with self.lock:
+            session, self.session = self.session, None
+        return session
+
+    def on_frame(self, frame_info):
+        """相机帧回调（RealSense处理线程），从不阻塞"""
+        session = self.session
+        image = frame_info.get('color_image')
+        if session is None or image is None:
+            return
+        session.submit(frame_info['timestamp'], frame_info['frame_index'], image)
@@ -30,12 +30,23 @@ class DataViewer:
                 }
 
                 # 读取数据
-                self.data = {
-                    'timestamps': np.array(f['data/timestamps']),
-                    'emg_raw': np.array(f['data/emg_raw']),
-                    'emg_filtered': np.array(f['data/emg_filtered']),
-                    'hand_angles': np.array(f['data/hand_angles'])
-                }
+                if 'emg' in f:
+                    # 双时间轴格式：EMG按Myo采样率，手部数据按相机帧率
+                    self.data = {
+                        'timestamps': np.array(f['emg/timestamps']),
+                        'emg_raw': np.array(f['emg/raw']),
+                        'emg_filtered': np.array(f['emg/filtered']),
+                        'hand_timestamps': np.array(f['hand/timestamps']),
+                        'hand_angles': np.array(f['hand/angles']),
+                        'joint_names': list(f['hand/angles'].attrs['joint_names'])
+                    }
+                else:
+                    self.data = {
+                        'timestamps': np.array(f['data/timestamps']),
+                        'emg_raw': np.array(f['data/emg_raw']),
+                        'emg_filtered': np.array(f['data/emg_filtered']),
+                        'hand_angles': np.array(f['data/hand_angles'])
+                    }
 
         except Exception as e:
             print(f"读取文件错误: {e}")